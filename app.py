@@ -1,26 +1,309 @@
-from fastapi import FastAPI, HTTPException, Header
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse
+from pydantic import BaseModel, HttpUrl, Field, PrivateAttr, field_validator, model_validator
+from typing import Awaitable, Callable, Optional, List, Dict, Literal, get_args
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import asyncio
+import hashlib
+import logging
 import os
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, LLMConfig
-from crawl4ai.extraction_strategy import LLMExtractionStrategy
+import time
+from urllib.parse import urlparse
+from crawl4ai import BrowserConfig, CrawlerRunConfig, CacheMode
+from browser_pool import BrowserPool
+from crawl_scheduler import CrawlScheduler
+from http_fetch import HttpFetcher, needs_javascript
+from resource_blocking import DEFAULT_BLOCKED_RESOURCE_TYPES, block_resources, blocking_rules, make_rules, parse_resource_types
+from llm_cache import ExtractionCache, create_cache_from_env
+from compression import CompressionMiddleware
+from streaming import ContentStreamParser, OrderedChunks, sse_event
+from recrawl import RecrawlStore, create_store_from_env as create_recrawl_store_from_env, fingerprint, response_header
+from neardup import create_index_from_env as create_neardup_index_from_env
+from page_data import parse_html, extract_links, extract_metadata, extract_image_urls
+from pruning import prune_to_main_content, estimate_tokens
+from llm_chunking import split_markdown, merge_blocks
+from llm_client import LLMClient, LLMClientPool, LLMError, extraction_prompt, parse_blocks
+from jobs import JobQueue, QueueFullError
+from memory_governor import governor_from_env
+import metrics
+from metrics import collect_timings, current_timings, stage, track_in_flight, record_llm_usage, server_timing
 import uvicorn
 
-app = FastAPI(title="Crawl4AI API", description="Extract content and images from web pages", version="1.0.0")
+logger = logging.getLogger(__name__)
 
-class CrawlRequest(BaseModel):
+# Browser config: headless, bigger viewport
+browser_conf = BrowserConfig(
+    headless=True,
+    viewport_width=1280,
+    viewport_height=720
+)
+
+# One browser shared by all requests, started and stopped with the app
+browser_pool = BrowserPool(
+    browser_conf,
+    max_pages=int(os.getenv("BROWSER_MAX_PAGES", "4")),
+    recycle_after=int(os.getenv("BROWSER_RECYCLE_AFTER", "200")),
+    hooks={"on_page_context_created": block_resources}
+)
+
+# What the browser does not download while rendering, unless a request overrides it
+BLOCKED_RESOURCE_TYPES = parse_resource_types(os.getenv("BLOCKED_RESOURCE_TYPES", ",".join(DEFAULT_BLOCKED_RESOURCE_TYPES)))
+BLOCK_TRACKERS = os.getenv("BLOCK_TRACKERS", "true").lower() in ("1", "true", "yes")
+BLOCKED_DOMAINS = [domain for domain in os.getenv("BLOCKED_DOMAINS", "").split(",") if domain.strip()]
+DEFAULT_BLOCKING_RULES = make_rules(BLOCKED_RESOURCE_TYPES, BLOCK_TRACKERS, BLOCKED_DOMAINS)
+metrics.BROWSER_ACTIVE_PAGES.set_function(lambda: browser_pool.active_pages)
+
+# Pauses and recycles the browser when the process tree nears the container's memory limit
+memory_governor = governor_from_env(browser_pool)
+
+# Plain HTTP client for pages that do not need JavaScript, pooled across requests
+http_fetcher = HttpFetcher(max_connections=int(os.getenv("HTTP_FETCH_MAX_CONNECTIONS", "32")))
+
+# Decides when each crawl may start: per-host politeness and round-robin between API keys
+crawl_scheduler = CrawlScheduler(
+    max_concurrent=int(os.getenv("CRAWL_MAX_CONCURRENCY", "8")),
+    host_limit=int(os.getenv("HOST_MAX_CONCURRENCY", "2")),
+    host_min_delay=float(os.getenv("HOST_MIN_DELAY", "0.5"))
+)
+metrics.SCHEDULER_ACTIVE.set_function(lambda: crawl_scheduler.active)
+
+# Cache of LLM extraction results keyed on page content, None when disabled
+extraction_cache = create_cache_from_env()
+
+# Validators, fingerprint and response of each URL's last crawl, None when disabled
+recrawl_store = create_recrawl_store_from_env()
+
+# SimHash index of extracted pages pointing into the extraction cache, to reuse an extraction for the same story under another URL; None when disabled
+neardup_index = create_neardup_index_from_env(extraction_cache)
+
+LLM_PROVIDER = "deepseek/deepseek-chat"
+# Override the DeepSeek endpoint, e.g. to point at the benchmark's mock server
+LLM_BASE_URL = os.getenv("DEEPSEEK_BASE_URL")
+
+# DeepSeek clients, one per API key, sharing a keep-alive connection pool. Each key's
+# concurrency adapts between 1 and LLM_MAX_CONCURRENCY_PER_KEY to the rate limits it meets.
+llm_clients = LLMClientPool(
+    model=LLM_PROVIDER.split("/", 1)[1],
+    base_url=LLM_BASE_URL,
+    max_clients=int(os.getenv("LLM_CLIENT_CACHE_SIZE", "256")),
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+    timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY_PER_KEY", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    hedge=os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+)
+
+# Upper bound for the per-batch concurrency a client may ask for
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Background jobs submitted through POST /jobs
+job_queue = JobQueue(
+    workers=int(os.getenv("JOBS_WORKERS", "4")),
+    max_queued=int(os.getenv("JOBS_MAX_QUEUED", "100")),
+    retention=float(os.getenv("JOBS_RETENTION", "3600")),
+    max_retained=int(os.getenv("JOBS_MAX_RETAINED", "200"))
+)
+
+# Tiny page crawled at startup so the first real request finds everything initialised
+WARM_UP_URL = "raw:<html><head><title>warm-up</title></head><body><p>warm-up</p></body></html>"
+
+# Set once the warm-up has finished, cleared again on shutdown; reported by /ready
+ready = False
+
+async def warm_up():
+    global ready
+    start = time.time()
+    try:
+        await browser_pool.start()
+    except Exception:
+        # Stay not ready: without a browser this instance should not get traffic
+        logger.exception("Browser failed to start")
+        return
+
+    # Pay for crawl4ai's lazy initialisation now: a page through the browser and the HTTP fetcher
+    # (scraping, markdown)
+    steps = (
+        ("browser", lambda: browser_pool.arun(WARM_UP_URL, config=CrawlerRunConfig(cache_mode=CacheMode.BYPASS, process_in_browser=True))),
+        ("http_fetch", lambda: http_fetcher.arun(WARM_UP_URL, config=RUN_CONF)),
+    )
+    for name, step in steps:
+        try:
+            await step()
+        except Exception:
+            # A cold first request is slow, not broken
+            logger.warning("Warm-up step %s failed", name, exc_info=True)
+    ready = True
+    logger.info("Warm-up finished in %.1fs", time.time() - start)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ready
+    await http_fetcher.start()
+    await llm_clients.start()
+    await job_queue.start()
+    await memory_governor.start()
+    if neardup_index is not None:
+        await neardup_index.start()
+    # /health answers while the browser starts; /ready waits for it
+    warm_up_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        ready = False
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+        await memory_governor.stop()
+        if neardup_index is not None:
+            await neardup_index.stop()
+        await job_queue.stop()
+        await llm_clients.close()
+        await http_fetcher.close()
+        await browser_pool.close()
+
+app = FastAPI(title="Crawl4AI API", description="Extract content and images from web pages", version="1.0.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
+
+# zstd/brotli/gzip as negotiated from Accept-Encoding
+if os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes"):
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+
+FieldSource = Literal["llm", "html"]
+
+ResourceType = Literal["image", "media", "font", "stylesheet"]
+
+# auto: plain HTTP first, the browser only when the page needs JavaScript
+FetchMode = Literal["auto", "http", "browser"]
+
+# CrawlResponse fields a client can pick with `fields`; success, error_message, processing_time
+# and timings are always returned
+ResponseField = Literal["content", "main_content_image_urls", "metadata", "links", "markdown", "pruning", "fetch"]
+RESPONSE_FIELDS = frozenset(get_args(ResponseField))
+
+class FieldSources(BaseModel):
+    # Where each response field comes from: the LLM, or parsed directly from the page HTML.
+    # "content" always comes from the LLM.
+    main_content_image_urls: FieldSource = "html"
+    metadata: FieldSource = "html"
+    links: FieldSource = "html"
+
+class PruningOptions(BaseModel):
+    # Cut the page down to its article region before it is sent to the LLM
+    enabled: bool = True
+    # Keep the full page when the region holds less than this share of the page's text
+    min_confidence: float = Field(0.5, ge=0, le=1)
+
+class ChunkingOptions(BaseModel):
+    # Split long pages into overlapping chunks that are extracted in parallel
+    enabled: bool = True
+    chunk_tokens: int = Field(2048, ge=256)
+    overlap_tokens: int = Field(200, ge=0)
+
+    @model_validator(mode="after")
+    def check_overlap(self):
+        # Each chunk repeats the overlap of the one before it; a large overlap multiplies the tokens sent to DeepSeek
+        if self.overlap_tokens > self.chunk_tokens // 2:
+            raise ValueError("overlap_tokens must be at most half of chunk_tokens")
+        return self
+
+class BlockingOptions(BaseModel):
+    # Resource types the browser does not download; None keeps the server default
+    resource_types: Optional[List[ResourceType]] = None
+    # Block known ad and analytics domains; None keeps the server default
+    block_trackers: Optional[bool] = None
+    # Extra domains (and their subdomains) to block for this request
+    domains: List[str] = []
+
+class ExtractOptions(BaseModel):
+    # Per-request extraction options shared by /extract and /extract/batch
+    sources: FieldSources = Field(default_factory=FieldSources)
+    pruning: PruningOptions = Field(default_factory=PruningOptions)
+    chunking: ChunkingOptions = Field(default_factory=ChunkingOptions)
+    # How the page is loaded
+    fetch_mode: FetchMode = "auto"
+    blocking: BlockingOptions = Field(default_factory=BlockingOptions)
+    # Add a per-stage timing breakdown (seconds) to the response
+    include_timings: bool = False
+    # Only compute and return these fields; None returns them all
+    fields: Optional[List[ResponseField]] = None
+    # Extract again even if the page has not changed since the last crawl
+    force_refresh: bool = False
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def split_fields(cls, value):
+        # Also accept "content,main_content_image_urls"
+        if isinstance(value, str):
+            return [field.strip() for field in value.split(",") if field.strip()]
+        return value
+
+    def wants(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
+class CrawlRequest(ExtractOptions):
     url: HttpUrl
 
+class BatchCrawlRequest(ExtractOptions):
+    urls: List[HttpUrl] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1)
+
+class PruningReport(BaseModel):
+    applied: bool
+    confidence: float
+    # Estimated tokens of page content sent to the LLM without and with pruning
+    input_tokens_before: int
+    input_tokens_after: int
+
+class FetchReport(BaseModel):
+    # http | browser: the path that produced the page; not_modified: the server answered 304
+    path: str
+    # Why an auto fetch went on to the browser: empty_body, spa_root, noscript_wall, not_html or http_error
+    escalation_reason: Optional[str] = None
+
+class ReuseReport(BaseModel):
+    # The page whose extraction was reused, and how many of the 64 SimHash bits of the two texts differ
+    url: str
+    distance: int
+
+class JobResponse(BaseModel):
+    job_id: str
+    # queued | running | completed | failed
+    status: str
+    # True when this job shares a crawl of the same URL submitted earlier
+    coalesced: bool = False
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional["CrawlResponse"] = None
+    error_message: Optional[str] = None
+
 class CrawlResponse(BaseModel):
     success: bool
+    # True when the page has not changed since the last crawl and the earlier extraction is returned
+    unchanged: bool = False
     content: Optional[str] = None
     main_content_image_urls: List[str] = []
     metadata: Optional[dict] = None
     links: List[str] = []
     markdown: Optional[str] = None
     error_message: Optional[str] = None
+    # Chunks whose LLM call failed; their part of the content is missing and error_message says why
+    failed_chunks: int = 0
     processing_time: Optional[float] = None
+    pruning: Optional[PruningReport] = None
+    fetch: Optional[FetchReport] = None
+    # Set when the text is a near-duplicate of a page extracted before and that extraction was reused
+    reused_from: Optional[ReuseReport] = None
+    timings: Optional[Dict[str, float]] = None
+
+    # The fields the client selected, None for all; not part of the response itself
+    _fields: Optional[frozenset] = PrivateAttr(default=None)
+
+    def excluded_fields(self) -> Optional[set]:
+        return None if self._fields is None else set(RESPONSE_FIELDS - self._fields)
+
+    def to_json(self) -> str:
+        return self.model_dump_json(exclude=self.excluded_fields())
 
 @app.get("/")
 async def root():
@@ -34,198 +317,498 @@ async def root():
         }
     }
 
-@app.post("/extract", response_model=CrawlResponse)
-async def extract_content(request: CrawlRequest, authorization: Optional[str] = Header(None)):
-    import time
-    start_time = time.time()
+def get_api_key(authorization: Optional[str]) -> str:
+    # Extract API key from Authorization header (Bearer token)
+    api_key = None
     
-    try:
-        # Extract API key from Authorization header (Bearer token)
-        api_key = None
-        
-        if authorization and authorization.startswith("Bearer "):
-            api_key = authorization.replace("Bearer ", "").strip()
-        else:
-            # Fallback to environment variable
-            api_key = os.getenv("DEEPSEEK_API_KEY")
-            
-        if not api_key:
-            raise HTTPException(
-                status_code=401, 
-                detail="DeepSeek API key is required. Provide it via Authorization header: 'Bearer your-api-key' or set DEEPSEEK_API_KEY environment variable."
-            )
+    if authorization and authorization.startswith("Bearer "):
+        api_key = authorization.replace("Bearer ", "").strip()
+    else:
+        # Fallback to environment variable
+        api_key = os.getenv("DEEPSEEK_API_KEY")
         
-        # Browser config: headless, bigger viewport
-        browser_conf = BrowserConfig(
-            headless=True,
-            viewport_width=1280,
-            viewport_height=720
+    if not api_key:
+        raise HTTPException(
+            status_code=401, 
+            detail="DeepSeek API key is required. Provide it via Authorization header: 'Bearer your-api-key' or set DEEPSEEK_API_KEY environment variable."
         )
+    
+    return api_key
 
-        # JSON schema for extracting main content and image URLs
-        extraction_schema = {
+def markdown_text(result) -> str:
+    # result.markdown is a str subclass carrying the raw markdown in newer crawl4ai versions
+    return getattr(result.markdown, "raw_markdown", None) or str(result.markdown or "")
+
+# JSON schema for extracting main content and image URLs
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "content": {
+            "type": "string",
+            "description": "The exact verbatim main text content of the web page in markdown format."
+        },
+        "main_content_image_urls": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "description": "An image url that appears within the main content of the web page. This image must be inside the main content of the page so you must exclude small logo images, icons, avatars and other images which aren't a core part of the main content. The image should be at least 600px in width."
+            },
+            "description": "An array of the exact image urls that appear within the main content of the web page. Extra images such as icons and images not relevant to the main content MUST be excluded."
+        },
+        "metadata": {
             "type": "object",
             "properties": {
-                "content": {
+                "url": {
                     "type": "string",
-                    "description": "The exact verbatim main text content of the web page in markdown format."
+                    "description": "The URL of the web page"
                 },
-                "main_content_image_urls": {
-                    "type": "array",
-                    "items": {
-                        "type": "string",
-                        "description": "An image url that appears within the main content of the web page. This image must be inside the main content of the page so you must exclude small logo images, icons, avatars and other images which aren't a core part of the main content. The image should be at least 600px in width."
-                    },
-                    "description": "An array of the exact image urls that appear within the main content of the web page. Extra images such as icons and images not relevant to the main content MUST be excluded."
+                "title": {
+                    "type": "string",
+                    "description": "The page title"
                 },
-                "metadata": {
-                    "type": "object",
-                    "properties": {
-                        "url": {
-                            "type": "string",
-                            "description": "The URL of the web page"
-                        },
-                        "title": {
-                            "type": "string",
-                            "description": "The page title"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "The page meta description"
-                        },
-                        "author": {
-                            "type": "string",
-                            "description": "The author of the content"
-                        },
-                        "publish_date": {
-                            "type": "string",
-                            "description": "The publication date if available"
-                        },
-                        "keywords": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Keywords or tags associated with the content"
-                        }
-                    },
-                    "description": "Metadata extracted from the web page including title, description, author, and other relevant information."
+                "description": {
+                    "type": "string",
+                    "description": "The page meta description"
+                },
+                "author": {
+                    "type": "string",
+                    "description": "The author of the content"
                 },
-                "links": {
+                "publish_date": {
+                    "type": "string",
+                    "description": "The publication date if available"
+                },
+                "keywords": {
                     "type": "array",
-                    "items": {
-                        "type": "string",
-                        "description": "A complete URL found on the web page."
-                    },
-                    "description": "An array of all unique links (href attributes) found on the web page. Include only complete URLs, not relative paths or fragments."
+                    "items": {"type": "string"},
+                    "description": "Keywords or tags associated with the content"
                 }
             },
-            "required": ["content", "main_content_image_urls", "metadata", "links"]
+            "description": "Metadata extracted from the web page including title, description, author, and other relevant information."
+        },
+        "links": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "description": "A complete URL found on the web page."
+            },
+            "description": "An array of all unique links (href attributes) found on the web page. Include only complete URLs, not relative paths or fragments."
         }
+    },
+    "required": ["content", "main_content_image_urls", "metadata", "links"]
+}
 
-        # LLM config for DeepSeek
-        llm_config = LLMConfig(
-            provider="deepseek/deepseek-chat",
-            api_token=api_key
-        )
+# Instruction for each schema field
+EXTRACTION_INSTRUCTIONS = {
+    "content": """
+        Identify the main content of the text (i.e., the article or newsletter body). 
+        Provide the exact text for that main content verbatim, without summarizing or rewriting any part of it. 
+        Exclude all non-essential elements such as banners, headers, footers, calls to action, ads, or purely navigational text. 
+        Format this output as markdown using appropriate '#' characters as heading levels. 
+        Exclude any promotional or sponsored content on your output. 
+        """,
+    "main_content_image_urls": """
+        Additionally, you must identify and extract the image urls within this main content. 
+        These images must be inside the main content of the page so you must exclude small logo images, icons, avatars and other images which aren't a core part of the main content. 
+        The images you extract should at least have a width of 600 pixels (px) so it can be included on our content.
+        """,
+    "metadata": """
+        Extract metadata from the web page including:
+        - url: The URL of the web page being crawled
+        - title: The page title (from <title> tag or main heading)
+        - description: Meta description or summary of the content
+        - author: Author name if available (from meta tags, byline, or author section)
+        - publish_date: Publication date if available (from meta tags or visible date)
+        - keywords: Relevant keywords or tags associated with the content
+        """,
+    "links": """
+        Extract all unique links found on the web page:
+        - Include only complete URLs (starting with http:// or https://)
+        - Exclude relative paths, fragments, or anchor links
+        - Include both internal and external links
+        - Deduplicate identical URLs
+        """
+}
 
-        # LLM extraction strategy with the specified prompt
-        extraction_strategy = LLMExtractionStrategy(
-            llm_config=llm_config,
-            schema=extraction_schema,
-            extraction_type="schema",
-            instruction="""
-            Identify the main content of the text (i.e., the article or newsletter body). 
-            Provide the exact text for that main content verbatim, without summarizing or rewriting any part of it. 
-            Exclude all non-essential elements such as banners, headers, footers, calls to action, ads, or purely navigational text. 
-            Format this output as markdown using appropriate '#' characters as heading levels. 
-            Exclude any promotional or sponsored content on your output. 
-            
-            Additionally, you must identify and extract the image urls within this main content. 
-            These images must be inside the main content of the page so you must exclude small logo images, icons, avatars and other images which aren't a core part of the main content. 
-            The images you extract should at least have a width of 600 pixels (px) so it can be included on our content.
-            
-            Extract metadata from the web page including:
-            - url: The URL of the web page being crawled
-            - title: The page title (from <title> tag or main heading)
-            - description: Meta description or summary of the content
-            - author: Author name if available (from meta tags, byline, or author section)
-            - publish_date: Publication date if available (from meta tags or visible date)
-            - keywords: Relevant keywords or tags associated with the content
-            
-            Extract all unique links found on the web page:
-            - Include only complete URLs (starting with http:// or https://)
-            - Exclude relative paths, fragments, or anchor links
-            - Include both internal and external links
-            - Deduplicate identical URLs
-            """
-        )
+# Crawler run config shared by every crawl. The LLM step runs separately so its result can be cached.
+RUN_CONF = CrawlerRunConfig(
+    cache_mode=CacheMode.BYPASS,
+    excluded_tags=["iframe", "nav", "header", "footer"]
+)
+
+def llm_fields_for(options: ExtractOptions) -> tuple:
+    # Only ask the LLM for requested fields it is the source of; empty when the LLM is not needed at all
+    content = ("content",) if options.wants("content") else ()
+    return content + tuple(
+        field for field, source in options.sources.model_dump().items() if source == "llm" and options.wants(field)
+    )
 
-        # Crawler run config
-        run_conf = CrawlerRunConfig(
-            extraction_strategy=extraction_strategy,
-            cache_mode=CacheMode.BYPASS,
-            excluded_tags=["iframe", "nav", "header", "footer"]
+@lru_cache(maxsize=None)
+def llm_extraction_spec(llm_fields: tuple) -> tuple:
+    # Schema and instruction for a set of LLM fields; there are only a handful of combinations
+    schema = {
+        "type": "object",
+        "properties": {field: EXTRACTION_SCHEMA["properties"][field] for field in llm_fields},
+        "required": list(llm_fields)
+    }
+    return schema, "".join(EXTRACTION_INSTRUCTIONS[field] for field in llm_fields)
+
+def llm_http_error(error: LLMError) -> HTTPException:
+    # Pass DeepSeek's verdict on to the client instead of a generic 500
+    if error.status == 429:
+        return HTTPException(
+            status_code=429,
+            detail=f"DeepSeek rate limit exceeded: {error}",
+            headers={"Retry-After": str(max(1, round(error.retry_after or 5)))}
         )
+    if error.status in (401, 403):
+        return HTTPException(status_code=401, detail=f"DeepSeek rejected the API key: {error}")
+    return HTTPException(status_code=502, detail=f"LLM extraction failed: {error}")
+
+# Receives the "content" text of chunk `index` as DeepSeek streams it
+ContentCallback = Callable[[int, str], Awaitable[None]]
+
+async def run_llm_extraction(url: str, markdown: str, llm_client: LLMClient, schema: dict, instruction: str, chunking: ChunkingOptions,
+                             on_content: Optional[ContentCallback] = None) -> list:
+    if chunking.enabled:
+        chunks = split_markdown(markdown, chunking.chunk_tokens, chunking.overlap_tokens)
+    else:
+        chunks = [markdown]
+    # Chunks run in parallel; their streamed text is passed on in document order
+    ordered = OrderedChunks(len(chunks), on_content) if on_content is not None else None
+
+    async def extract_chunk(index: int, chunk: str) -> list:
+        on_delta = None
+        if ordered is not None:
+            parser = ContentStreamParser()
+
+            async def on_delta(text: str):
+                await ordered.write(index, parser.feed(text))
+        try:
+            content, usage = await llm_client.complete(extraction_prompt(url, chunk, schema, instruction), on_delta=on_delta)
+        finally:
+            if ordered is not None:
+                await ordered.finish(index)
+        record_llm_usage(usage)
+        return parse_blocks(content)
+
+    # gather keeps chunk order, so the blocks come back in document order
+    with stage("llm_request"):
+        results = await asyncio.gather(*(extract_chunk(index, chunk) for index, chunk in enumerate(chunks)), return_exceptions=True)
 
-        async with AsyncWebCrawler(config=browser_conf) as crawler:
-            result = await crawler.arun(url=str(request.url), config=run_conf)
-
-            processing_time = time.time() - start_time
-
-            if result.success:
-                # Parse the extracted content
-                extracted_data = {}
-                content_text = ""
-                image_urls = []
-                metadata = {}
-                links = []
-                
-                if result.extracted_content:
-                    try:
-                        if isinstance(result.extracted_content, str):
-                            # Try to parse as JSON string
-                            import json
-                            parsed_content = json.loads(result.extracted_content)
-                            if isinstance(parsed_content, list) and len(parsed_content) > 0:
-                                extracted_data = parsed_content[0]
-                            elif isinstance(parsed_content, dict):
-                                extracted_data = parsed_content
-                        elif isinstance(result.extracted_content, list) and len(result.extracted_content) > 0:
-                            extracted_data = result.extracted_content[0]
-                        elif isinstance(result.extracted_content, dict):
-                            extracted_data = result.extracted_content
-                        
-                        # Extract content, images, metadata, and links safely
-                        if isinstance(extracted_data, dict):
-                            content_text = extracted_data.get("content", "")
-                            image_urls = extracted_data.get("main_content_image_urls", [])
-                            metadata = extracted_data.get("metadata", {})
-                            links = extracted_data.get("links", [])
-                            
-                            # Ensure URL is always included in metadata
-                            if not metadata.get("url"):
-                                metadata["url"] = str(request.url)
-                            
-                    except (json.JSONDecodeError, TypeError):
-                        # If parsing fails, treat as empty
-                        extracted_data = {}
-                
-                # Ensure URL is always included in metadata, even if extraction failed
-                if not metadata:
-                    metadata = {"url": str(request.url)}
-                elif not metadata.get("url"):
-                    metadata["url"] = str(request.url)
-                
-                return CrawlResponse(
-                    success=True,
-                    content=content_text,
-                    main_content_image_urls=image_urls,
-                    metadata=metadata,
-                    links=links,
-                    markdown=result.markdown,
-                    processing_time=processing_time
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        if not isinstance(error, LLMError):
+            raise error
+    if errors and len(errors) == len(results):
+        raise llm_http_error(errors[0])
+    # A chunk that failed leaves an error block; the other chunks still count
+    blocks = []
+    for index, result in enumerate(results):
+        if isinstance(result, LLMError):
+            blocks.append({"index": index, "error": True, "tags": ["error"], "content": str(result)})
+        else:
+            blocks.extend(result)
+    return blocks
+
+def extraction_cache_key(markdown: str, schema: dict, instruction: str, chunking: ChunkingOptions) -> str:
+    return ExtractionCache.make_key(markdown, schema, instruction, LLM_PROVIDER, chunking.model_dump_json())
+
+async def extract_with_cache(url: str, markdown: str, llm_client: LLMClient, schema: dict, instruction: str, chunking: ChunkingOptions,
+                             on_content: Optional[ContentCallback] = None, refresh: bool = False) -> list:
+    # `refresh` skips the cached extraction but still caches the new one
+    if extraction_cache is None:
+        return await run_llm_extraction(url, markdown, llm_client, schema, instruction, chunking, on_content)
+
+    key = extraction_cache_key(markdown, schema, instruction, chunking)
+    blocks = None if refresh else await extraction_cache.get(key)
+    if blocks is not None:
+        # The same content may have been cached under another URL
+        for block in blocks:
+            if isinstance(block, dict) and isinstance(block.get("metadata"), dict):
+                block["metadata"]["url"] = url
+        return blocks
+
+    blocks = await run_llm_extraction(url, markdown, llm_client, schema, instruction, chunking, on_content)
+    # Failed LLM calls come back as blocks flagged with "error"; never cache those
+    if blocks and not any(isinstance(block, dict) and block.get("error") for block in blocks):
+        await extraction_cache.set(key, blocks)
+    return blocks
+
+def escalation_reason(result) -> Optional[str]:
+    # Why a plain HTTP result cannot be used as it is
+    if not result.success:
+        return "http_error"
+    content_type = (result.response_headers or {}).get("Content-Type") or (result.response_headers or {}).get("content-type") or ""
+    if content_type and "html" not in content_type.lower():
+        return "not_html"
+    return needs_javascript(result.html)
+
+def blocking_rules_for(blocking: BlockingOptions):
+    if blocking.resource_types is None and blocking.block_trackers is None and not blocking.domains:
+        return DEFAULT_BLOCKING_RULES
+    return make_rules(
+        BLOCKED_RESOURCE_TYPES if blocking.resource_types is None else blocking.resource_types,
+        BLOCK_TRACKERS if blocking.block_trackers is None else blocking.block_trackers,
+        BLOCKED_DOMAINS + blocking.domains
+    )
+
+async def fetch_page(url: str, run_conf: CrawlerRunConfig, mode: str, previous: Optional[dict] = None):
+    # The result is None when the server confirmed with a 304 that the page is as `previous` saw it
+    result = None
+    if previous is not None and (previous.get("etag") or previous.get("last_modified")):
+        result = await http_fetcher.fetch_if_modified(url, run_conf, previous.get("etag"), previous.get("last_modified"))
+        if result is None:
+            metrics.FETCHES.labels(path="not_modified").inc()
+            return None, FetchReport(path="not_modified")
+
+    if mode == "browser":
+        # The page has changed (or could not be checked), so it is rendered as asked
+        result, report = await browser_pool.arun(url, config=run_conf), FetchReport(path="browser")
+    elif mode == "http":
+        result, report = result or await http_fetcher.arun(url, config=run_conf), FetchReport(path="http")
+    else:
+        result = result or await http_fetcher.arun(url, config=run_conf)
+        reason = await asyncio.to_thread(escalation_reason, result)
+        if reason is None:
+            report = FetchReport(path="http")
+        else:
+            metrics.FETCH_ESCALATIONS.labels(reason=reason).inc()
+            result, report = await browser_pool.arun(url, config=run_conf), FetchReport(path="browser", escalation_reason=reason)
+    metrics.FETCHES.labels(path=report.path).inc()
+    return result, report
+
+def recrawl_variant(options: ExtractOptions) -> str:
+    # Options that change what a crawl returns; a re-crawl with other options is a different entry
+    return options.model_dump_json(include={"sources", "pruning", "chunking", "fields"})
+
+def timings_for(options: ExtractOptions) -> Optional[Dict[str, float]]:
+    timings = current_timings()
+    if not options.include_timings or timings is None:
+        return None
+    return {name: round(seconds, 4) for name, seconds in timings.items()}
+
+def stored_response(response: CrawlResponse, options: ExtractOptions) -> dict:
+    # The full page markdown is often most of a response; it is only kept when the client asked for it by name,
+    # so a re-crawl answered by a 304 has markdown only then
+    exclude = None if options.fields is not None and "markdown" in options.fields else {"markdown"}
+    return response.model_dump(mode="json", exclude=exclude)
+
+def unchanged_response(previous: dict, fetch_report: FetchReport, start_time: float, options: ExtractOptions,
+                       result=None) -> CrawlResponse:
+    update = {}
+    # Markdown is usually not stored; when the page was fetched again it comes from this crawl
+    if result is not None and options.wants("markdown"):
+        update["markdown"] = result.markdown
+    response = CrawlResponse.model_validate(previous["response"]).model_copy(update={
+        **update,
+        "unchanged": True,
+        "fetch": fetch_report,
+        "processing_time": time.time() - start_time,
+        "timings": timings_for(options)
+    })
+    if options.fields is not None:
+        response._fields = frozenset(options.fields)
+    return response
+
+def html_fields(result, url: str, options: ExtractOptions) -> dict:
+    # The requested fields whose source is the page HTML; parsing a large page takes a while, so run it in a thread
+    sources = options.sources
+    fields = {}
+    want_images = sources.main_content_image_urls == "html" and options.wants("main_content_image_urls")
+    want_metadata = sources.metadata == "html" and options.wants("metadata")
+    if want_images or want_metadata:
+        soup = parse_html(result.html)
+        if want_images:
+            fields["main_content_image_urls"] = extract_image_urls(soup, result.redirected_url or url)
+        if want_metadata:
+            fields["metadata"] = extract_metadata(soup, url)
+    if sources.links == "html" and options.wants("links"):
+        fields["links"] = extract_links(result.links)
+    return fields
+
+# Links and image URLs differ between copies of a story, so for a reused extraction they are
+# taken from this page's HTML even when they normally come from the LLM
+RELOCATED_FIELDS = ("main_content_image_urls", "links")
+
+def reused_page_fields(data: dict, url: str) -> dict:
+    # A reused extraction describes another URL: its metadata gets this page's URL
+    if isinstance(data.get("metadata"), dict):
+        return {"metadata": {**data["metadata"], "url": url}}
+    return {}
+
+def relocated_options(options: ExtractOptions, relocated: List[str]) -> ExtractOptions:
+    # Sources set so html_fields computes exactly the relocated fields
+    sources = FieldSources(**{field: "html" if field in relocated else "llm" for field in FieldSources.model_fields})
+    return options.model_copy(update={"sources": sources})
+
+# Receives progress events (name, data) while a crawl runs, e.g. for /extract/stream
+ProgressCallback = Callable[[str, dict], Awaitable[None]]
+
+@track_in_flight
+async def crawl_url(url: str, api_key: str, options: Optional[ExtractOptions] = None,
+                    progress: Optional[ProgressCallback] = None) -> CrawlResponse:
+    start_time = time.time()
+    options = options or ExtractOptions()
+
+    llm_fields = llm_fields_for(options)
+
+    # What this URL returned last time, unless the client asks for a fresh extraction
+    recrawl_key = RecrawlStore.make_key(url, recrawl_variant(options)) if recrawl_store is not None else None
+    previous = await recrawl_store.get(recrawl_key) if recrawl_store is not None and not options.force_refresh else None
+
+    host = (urlparse(url).hostname or "").lower()
+    # Keys are told apart by a short hash, which is also what /health shows
+    async with crawl_scheduler.slot(key_owner(api_key)[:12], host):
+        with blocking_rules(blocking_rules_for(options.blocking)):
+            result, fetch_report = await fetch_page(url, RUN_CONF, options.fetch_mode, previous)
+    if progress is not None:
+        await progress("fetched", {
+            "url": url,
+            "success": result is None or result.success,
+            "fetch": fetch_report.model_dump(),
+            "elapsed": round(time.time() - start_time, 3)
+        })
+
+    if result is None:
+        recrawl_store.record("not_modified")
+        return unchanged_response(previous, fetch_report, start_time, options)
+
+    if result.success:
+        validators = {"etag": response_header(result, "ETag"), "last_modified": response_header(result, "Last-Modified")}
+        if progress is not None and options.wants("markdown"):
+            await progress("markdown", {"markdown": str(result.markdown or "")})
+        llm_markdown = markdown_text(result)
+        pruning_report = None
+        if llm_fields and options.pruning.enabled:
+            with stage("pruning"):
+                pruned = await asyncio.to_thread(
+                    prune_to_main_content, result.html, url, llm_markdown, options.pruning.min_confidence
                 )
+            pruning_report = PruningReport(
+                applied=pruned.applied,
+                confidence=round(pruned.confidence, 3),
+                input_tokens_before=estimate_tokens(llm_markdown),
+                input_tokens_after=estimate_tokens(pruned.markdown)
+            )
+            llm_markdown = pruned.markdown
+
+        # The fingerprint covers the cleaned main text, so a new ad or timestamp around the article does not count as a change
+        page_fingerprint = fingerprint(llm_markdown) if recrawl_store is not None else None
+        if previous is not None and previous.get("fingerprint") == page_fingerprint:
+            recrawl_store.record("unchanged")
+            await recrawl_store.set(recrawl_key, {**previous, **validators})
+            return unchanged_response(previous, fetch_report, start_time, options, result)
+
+        # Fill the fields that come straight from the page instead of the LLM, before the LLM is called
+        with stage("html_extraction"):
+            page_data = await asyncio.to_thread(html_fields, result, url, options)
+        if progress is not None and page_data:
+            await progress("metadata", page_data)
+
+        extracted_data = {}
+        reused_from = None
+        failed_blocks = []
+        # Fields left out of `fields` are not computed; if none of them comes from the LLM, DeepSeek is not called
+        if llm_fields:
+            # Extractions are only interchangeable when they asked the LLM for the same fields
+            neardup_variant = ",".join(llm_fields)
+            page_simhash = await asyncio.to_thread(neardup_index.fingerprint, llm_markdown) if neardup_index is not None else None
+            duplicate = None
+            if page_simhash is not None and not options.force_refresh:
+                duplicate = await neardup_index.find(page_simhash, url, neardup_variant)
+
+            if duplicate is not None:
+                with stage("parse"):
+                    extracted_data = merge_blocks(duplicate.blocks)
+                reused_from = ReuseReport(url=duplicate.url, distance=duplicate.distance)
+                page_data = {**reused_page_fields(extracted_data, url), **page_data}
+                relocated = [field for field in RELOCATED_FIELDS if getattr(options.sources, field) == "llm" and options.wants(field)]
+                if relocated:
+                    with stage("html_extraction"):
+                        page_data.update(await asyncio.to_thread(html_fields, result, url, relocated_options(options, relocated)))
             else:
-                raise HTTPException(status_code=500, detail=result.error_message)
+                extraction_schema, extraction_instruction = llm_extraction_spec(llm_fields)
+                llm_client = await llm_clients.get(api_key)
+                on_content = None
+                if progress is not None:
+                    async def on_content(index: int, text: str):
+                        await progress("content", {"chunk": index, "delta": text})
+                extracted_content = await extract_with_cache(
+                    url, llm_markdown, llm_client, extraction_schema, extraction_instruction, options.chunking, on_content,
+                    refresh=options.force_refresh
+                )
+
+                # Merge the blocks of every chunk, in document order
+                failed_blocks = [block for block in extracted_content if isinstance(block, dict) and block.get("error")]
+                if extracted_content and len(failed_blocks) == len(extracted_content):
+                    raise HTTPException(status_code=500, detail=f"LLM extraction failed: {extracted_content[0].get('content')}")
+                with stage("parse"):
+                    extracted_data = merge_blocks(extracted_content)
+                # The extraction is now in the cache (partly failed ones never are); index a pointer to it
+                if page_simhash is not None and not failed_blocks:
+                    neardup_index.add(
+                        page_simhash, url, extraction_cache_key(llm_markdown, extraction_schema, extraction_instruction, options.chunking),
+                        neardup_variant
+                    )
+
+        extracted_data.update(page_data)
+        content_text = extracted_data.get("content", "")
+        image_urls = extracted_data.get("main_content_image_urls", [])
+        metadata = extracted_data.get("metadata", {})
+        links = extracted_data.get("links", [])
+
+        # Ensure URL is always included in metadata, even if extraction failed
+        if not metadata:
+            metadata = {"url": url}
+        elif not metadata.get("url"):
+            metadata["url"] = url
+
+        processing_time = time.time() - start_time
+        # Some chunks failed: the rest is still returned, but flagged so it is not taken for a complete extraction
+        error_message = None
+        if failed_blocks:
+            error_message = f"LLM extraction failed for {len(failed_blocks)} chunk(s), content is incomplete: {failed_blocks[0].get('content')}"
+
+        response = CrawlResponse(
+            success=True,
+            error_message=error_message,
+            failed_chunks=len(failed_blocks),
+            content=content_text,
+            main_content_image_urls=image_urls,
+            metadata=metadata,
+            links=links,
+            markdown=result.markdown if options.wants("markdown") else None,
+            processing_time=processing_time,
+            pruning=pruning_report,
+            fetch=fetch_report,
+            reused_from=reused_from,
+            timings=timings_for(options)
+        )
+        if options.fields is not None:
+            response._fields = frozenset(options.fields)
+
+        if recrawl_store is not None:
+            if previous is not None:
+                recrawl_store.record("changed")
+            # An incomplete extraction is not kept, or every re-crawl of the unchanged page would return it
+            if not failed_blocks:
+                await recrawl_store.set(recrawl_key, {**validators, "fingerprint": page_fingerprint, "response": stored_response(response, options)})
+        return response
+    else:
+        raise HTTPException(status_code=500, detail=result.error_message)
+
+@app.post("/extract", response_model=CrawlResponse)
+async def extract_content(request: CrawlRequest, authorization: Optional[str] = Header(None)):
+    start_time = time.time()
+    
+    try:
+        api_key = get_api_key(authorization)
+        with collect_timings() as timings:
+            result = await crawl_url(str(request.url), api_key, request)
+        # Serialized by pydantic-core in one pass instead of FastAPI's validate-encode-dump round trip
+        return Response(content=result.to_json(), media_type="application/json",
+                        headers={"Server-Timing": server_timing(timings)})
 
     except HTTPException:
         raise
@@ -236,9 +819,157 @@ async def extract_content(request: CrawlRequest, authorization: Optional[str] =
             detail=f"Internal server error: {str(e)}"
         )
 
+async def crawl_url_safe(url: str, api_key: str, options: Optional[ExtractOptions] = None) -> CrawlResponse:
+    # Like crawl_url, but reports failures as an unsuccessful response instead of raising
+    start_time = time.time()
+    try:
+        return await crawl_url(url, api_key, options)
+    except Exception as e:
+        error_message = e.detail if isinstance(e, HTTPException) else f"Internal server error: {str(e)}"
+        return CrawlResponse(
+            success=False,
+            metadata={"url": url},
+            error_message=str(error_message),
+            processing_time=time.time() - start_time
+        )
+
+async def stream_batch(urls: List[str], api_key: str, concurrency: int, options: Optional[ExtractOptions] = None):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(url: str) -> CrawlResponse:
+        with collect_timings():
+            with stage("queue_wait"):
+                await semaphore.acquire()
+            try:
+                return await crawl_url_safe(url, api_key, options)
+            finally:
+                semaphore.release()
+
+    tasks = [asyncio.create_task(run_one(url)) for url in urls]
+    try:
+        # Emit each result as soon as it is ready, not in request order
+        for next_done in asyncio.as_completed(tasks):
+            response = await next_done
+            yield response.to_json() + "\n"
+    finally:
+        # Client went away or the stream finished: drop anything still pending
+        for task in tasks:
+            task.cancel()
+
+@app.post("/extract/batch")
+async def extract_batch(request: BatchCrawlRequest, authorization: Optional[str] = Header(None)):
+    api_key = get_api_key(authorization)
+    concurrency = min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    urls = [str(url) for url in request.urls]
+    return StreamingResponse(stream_batch(urls, api_key, concurrency, request), media_type="application/x-ndjson")
+
+async def stream_extraction(url: str, api_key: str, options: ExtractOptions):
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def progress(event: str, data: dict):
+        await events.put(sse_event(event, data))
+
+    async def run():
+        try:
+            with collect_timings():
+                result = await crawl_url(url, api_key, options, progress=progress)
+            await events.put(sse_event("result", result.to_json()))
+        except HTTPException as e:
+            await events.put(sse_event("error", {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            await events.put(sse_event("error", {"status_code": 500, "detail": f"Internal server error: {str(e)}"}))
+        finally:
+            await events.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+    finally:
+        # Client went away: stop the crawl too
+        task.cancel()
+
+@app.post("/extract/stream")
+async def extract_stream(request: CrawlRequest, authorization: Optional[str] = Header(None)):
+    api_key = get_api_key(authorization)
+    return StreamingResponse(
+        stream_extraction(str(request.url), api_key, request),
+        media_type="text/event-stream",
+        # Proxies must pass events on as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def job_response(job, status_code: int = 200) -> Response:
+    body = JobResponse(
+        job_id=job.id,
+        status=job.status,
+        coalesced=job.coalesced,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error_message=job.error
+    )
+    excluded = job.result.excluded_fields() if job.result is not None else None
+    return Response(
+        content=body.model_dump_json(exclude={"result": excluded} if excluded else None),
+        status_code=status_code,
+        media_type="application/json"
+    )
+
+def key_owner(api_key: str) -> str:
+    # Jobs remember a hash of the submitting key, never the key itself
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: CrawlRequest, authorization: Optional[str] = Header(None)):
+    api_key = get_api_key(authorization)
+    url = str(request.url)
+    options = ExtractOptions(**request.model_dump(exclude={"url"}))
+    owner = key_owner(api_key)
+    # Jobs for the same URL and options share one crawl while it is in flight, but only within one API key:
+    # the crawl calls DeepSeek with the key of whoever submitted it first
+    key = owner + "\n" + url + "\n" + options.model_dump_json()
+
+    try:
+        job = job_queue.submit(key, owner, lambda: crawl_url(url, api_key, options))
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    return job_response(job, status_code=202)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, authorization: Optional[str] = Header(None)):
+    api_key = get_api_key(authorization)
+    job = job_queue.get(job_id)
+    if job is None or job.owner != key_owner(api_key):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/ready")
+async def readiness_check():
+    # For load balancer / orchestrator readiness probes: no traffic until the warm-up is done
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "crawl4ai-api"}
+    return {"status": "healthy", "service": "crawl4ai-api", "browser": browser_pool.stats(),
+            "llm_cache": extraction_cache.stats() if extraction_cache else None,
+            "http_fetch": http_fetcher.stats(), "scheduler": crawl_scheduler.stats(), "llm": llm_clients.stats(),
+            "recrawl": recrawl_store.stats() if recrawl_store else None,
+            "neardup": neardup_index.stats() if neardup_index else None,
+            "jobs": job_queue.stats(),
+            "memory": memory_governor.stats()}
+
+JobResponse.model_rebuild()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, access_log=True, log_level="info") 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, access_log=True, log_level="info") 
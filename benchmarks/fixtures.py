@@ -0,0 +1,140 @@
+"""
+Local fixture site for benchmarks: a small corpus of realistic article pages.
+
+Pages are generated deterministically and served from memory:
+
+    /small.html    short news article
+    /huge.html     long live blog / newsletter with many sections
+    /js.html       single-page app whose article is rendered by JavaScript
+    /images.html   photo-heavy article with srcset images
+    /img/<n>.jpg   placeholder image bytes used by the pages
+"""
+
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+WORDS = (
+    "agency officials said the new policy would affect hospitals patients and insurers across the country "
+    "while critics argued that the plan lacked funding and clear oversight from federal regulators "
+    "several lawmakers questioned the timeline and asked for more data on costs outcomes and access to care"
+).split()
+
+# Smallest valid GIF; image bytes only need to exist, not look like anything
+PLACEHOLDER_IMAGE = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,"
+    b"\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(12, 28))]
+    words[0] = words[0].capitalize()
+    # Commas make the text look like prose to the pruning heuristics, as real articles do
+    words[len(words) // 2] += ","
+    return " ".join(words) + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+
+
+def _page(title: str, body: str, head_extra: str = "") -> str:
+    """Wrap article markup in the usual news-site furniture."""
+    related = "".join(f'<li><a href="/story-{n}.html">Related story number {n} with a long headline</a></li>' for n in range(12))
+    comments = "".join(f"<p>Comment {n}: interesting, but I disagree with the premise, honestly.</p>" for n in range(8))
+    return f"""<!DOCTYPE html>
+<html><head>
+<title>{title}</title>
+<meta name="description" content="{title} - fixture article">
+<meta property="og:title" content="{title}">
+<meta name="author" content="Fixture Reporter">
+<meta property="article:published_time" content="2025-07-08T10:00:00Z">
+<script>window.analytics = {{ track: function () {{}} }};</script>
+{head_extra}
+</head><body>
+<div class="cookie-banner"><p>We use cookies to improve your experience, please accept them to continue reading.</p></div>
+<header><nav><a href="/">Home</a> <a href="/health.html">Health</a> <a href="/policy.html">Policy</a></nav></header>
+<div class="layout">
+{body}
+<aside class="sidebar related"><h3>Related</h3><ul>{related}</ul></aside>
+<section class="comments"><h3>Comments</h3>{comments}</section>
+</div>
+<footer><p>Copyright 2025 Fixture News, all rights reserved.</p></footer>
+</body></html>"""
+
+
+def _article(rng: random.Random, title: str, sections: int, paragraphs: int, images: int = 0) -> str:
+    parts = [f"<h1>{title}</h1>", '<p class="byline">By Fixture Reporter</p>']
+    image_number = 0
+    for section in range(sections):
+        if sections > 1:
+            parts.append(f"<h2>Section {section + 1}</h2>")
+        for _ in range(paragraphs):
+            parts.append(f"<p>{_paragraph(rng)}</p>")
+            if image_number < images:
+                n = image_number
+                parts.append(
+                    f'<figure><img src="/img/{n}.jpg" '
+                    f'srcset="/img/{n}-480.jpg 480w, /img/{n}-1200.jpg 1200w" sizes="(max-width: 600px) 100vw, 800px" '
+                    f'alt="Photo {n}"><figcaption>Photo {n}, courtesy of the agency.</figcaption></figure>'
+                )
+                image_number += 1
+    return '<article class="article-body">' + "".join(parts) + "</article>"
+
+
+def build_corpus(seed: int = 7) -> Dict[str, str]:
+    rng = random.Random(seed)
+    small = _article(rng, "Small article", sections=1, paragraphs=5)
+    huge = _article(rng, "Daily newsletter", sections=40, paragraphs=8)
+    images = _article(rng, "Photo essay", sections=6, paragraphs=4, images=24)
+
+    # The SPA ships an empty root and renders the article client-side
+    spa_markup = _article(rng, "Client rendered article", sections=3, paragraphs=4)
+    spa_script = f"""<script>
+document.addEventListener("DOMContentLoaded", function () {{
+  document.getElementById("root").innerHTML = {json.dumps(spa_markup)};
+}});
+</script>"""
+
+    return {
+        "/small.html": _page("Small article", small),
+        "/huge.html": _page("Daily newsletter", huge),
+        "/images.html": _page("Photo essay", images),
+        "/js.html": _page("Client rendered article", '<div id="root"></div>', head_extra=spa_script),
+    }
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    corpus: Dict[str, str] = {}
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/img/"):
+            self._send(200, "image/gif", PLACEHOLDER_IMAGE)
+        elif path in self.corpus:
+            self._send(200, "text/html; charset=utf-8", self.corpus[path].encode("utf-8"))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(host: str = "127.0.0.1", port: int = 0, seed: int = 7) -> Tuple[ThreadingHTTPServer, List[str]]:
+    """Serve the corpus in a background thread. Returns the server and the page URLs."""
+    handler = type("FixtureHandler", (_FixtureHandler,), {"corpus": build_corpus(seed)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, [base_url + path for path in handler.corpus]
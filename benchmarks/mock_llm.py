@@ -0,0 +1,155 @@
+"""
+Local OpenAI-compatible stand-in for deepseek/deepseek-chat.
+
+Answers POST /chat/completions (and /v1/chat/completions) with a schema
+extraction that echoes the page content crawl4ai put in the prompt, after
+waiting as long as a real model would: `latency` seconds to the first token,
+then `tokens_per_second` for the output. `stream: true` is supported.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+# Same words-to-tokens estimate crawl4ai uses
+WORD_TOKEN_RATE = 1.3
+
+URL_CONTENT_PATTERN = re.compile(r"<url_content>\s*(.*?)\s*</url_content>", re.DOTALL)
+
+
+def _tokens(text: str) -> int:
+    return int(len(text.split()) * WORD_TOKEN_RATE)
+
+
+def _page_content(prompt: str) -> str:
+    match = URL_CONTENT_PATTERN.search(prompt)
+    if not match:
+        return ""
+    content = match.group(1)
+    # crawl4ai JSON-escapes the page before putting it in the prompt
+    try:
+        return json.loads('"' + content + '"')
+    except json.JSONDecodeError:
+        return content
+
+
+class MockLLMSettings:
+    def __init__(self, latency: float = 0.5, tokens_per_second: float = 50.0, max_output_tokens: int = 8192):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.max_output_tokens = max_output_tokens
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class _MockLLMHandler(BaseHTTPRequestHandler):
+    settings: MockLLMSettings = None
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.settings.lock:
+            self.settings.requests += 1
+
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        # Output is the page text, cut to the output token budget
+        words = re.findall(r"\S+\s*", _page_content(prompt))
+        content = "".join(words[:int(self.settings.max_output_tokens / WORD_TOKEN_RATE)]).strip()
+        answer = "<blocks>" + json.dumps([{
+            "content": content,
+            "main_content_image_urls": [],
+            "metadata": {},
+            "links": [],
+        }]) + "</blocks>"
+        usage = {
+            "prompt_tokens": _tokens(prompt),
+            "completion_tokens": _tokens(answer),
+            "total_tokens": _tokens(prompt) + _tokens(answer),
+        }
+
+        time.sleep(self.settings.latency)
+        if body.get("stream"):
+            self._stream(body.get("model", "deepseek-chat"), answer, usage)
+            return
+        time.sleep(usage["completion_tokens"] / self.settings.tokens_per_second)
+        self._send_json(200, {
+            "id": "chatcmpl-" + uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "deepseek-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, model: str, answer: str, usage: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        completion_id = "chatcmpl-" + uuid.uuid4().hex
+        # Stream in pieces of about ten tokens at the configured rate
+        pieces = re.findall(r"\S+\s*", answer)
+        step = 8
+        for start in range(0, len(pieces), step):
+            piece = "".join(pieces[start:start + step])
+            self._event({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            })
+            time.sleep(_tokens(piece) / self.settings.tokens_per_second)
+        self._event({
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage,
+        })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _event(self, payload: dict):
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_llm(settings: MockLLMSettings, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the mock in a background thread. Returns the server and its base URL."""
+    handler = type("MockLLMHandler", (_MockLLMHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock DeepSeek server on its own")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Output generation rate")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_llm(MockLLMSettings(args.latency, args.tokens_per_second), port=args.port)
+    print(f"Mock DeepSeek listening on {base_url} (set DEEPSEEK_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
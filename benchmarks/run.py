@@ -0,0 +1,231 @@
+"""
+Offline load test for the extraction API.
+
+Starts the local fixture site and the mock DeepSeek server, launches the API
+with uvicorn pointed at the mock (or uses --target), drives /extract at the
+requested concurrency and writes a JSON report:
+
+    python -m benchmarks.run --requests 40 --concurrency 4
+    python -m benchmarks.run --baseline benchmarks/results/previous.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from typing import List, Optional
+
+import psutil
+import requests
+
+from benchmarks.fixtures import start_fixture_server
+from benchmarks.mock_llm import MockLLMSettings, start_mock_llm
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def start_service(port: int, llm_base_url: str, env_overrides: dict) -> subprocess.Popen:
+    env = dict(os.environ, DEEPSEEK_BASE_URL=llm_base_url, **env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env
+    )
+    return process
+
+
+def wait_until_ready(target: str, timeout: float = 120):
+    # /ready, not /health: load must not start before the browser warm-up, or its launch lands in the latencies
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{target}/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Service at {target} did not become ready within {timeout}s")
+
+
+class ResourceSampler:
+    """Samples RSS and browser process count of a local service while the load runs."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.process = psutil.Process(pid) if pid else None
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_browser_processes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if self.process:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processes = [self.process] + self.process.children(recursive=True)
+            except psutil.Error:
+                return
+            rss = 0
+            browsers = 0
+            for process in processes:
+                try:
+                    rss += process.memory_info().rss
+                    name = process.name().lower()
+                except psutil.Error:
+                    continue
+                if "chrom" in name and "--type=" not in " ".join(process.cmdline()):
+                    # Count browser main processes, not their renderer/GPU helpers
+                    browsers += 1
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_browser_processes = max(self.peak_browser_processes, browsers)
+            self._stop.wait(self.interval)
+
+
+def run_load(target: str, urls: List[str], total: int, concurrency: int, api_key: str, timeout: float) -> List[dict]:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    headers = {"Authorization": f"Bearer {api_key}"}
+    url_cycle = cycle(urls)
+    jobs = [next(url_cycle) for _ in range(total)]
+
+    def one(url: str) -> dict:
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{target}/extract", json={"url": url}, headers=headers, timeout=timeout)
+            ok = response.status_code == 200 and response.json().get("success", False)
+            status = response.status_code
+        except requests.RequestException as e:
+            ok, status = False, str(e)
+        return {"url": url, "ok": ok, "status": status, "latency": time.perf_counter() - start}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one, jobs))
+
+
+def summarize(samples: List[dict], wall_time: float) -> dict:
+    latencies = [sample["latency"] for sample in samples if sample["ok"]]
+    per_page = {}
+    for sample in samples:
+        page = sample["url"].rsplit("/", 1)[-1]
+        per_page.setdefault(page, []).append(sample["latency"])
+    return {
+        "requests": len(samples),
+        "succeeded": len(latencies),
+        "failed": len(samples) - len(latencies),
+        "wall_time": wall_time,
+        "throughput_rps": len(latencies) / wall_time if wall_time else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "latency_p50_by_page": {page: percentile(values, 50) for page, values in per_page.items()},
+        "errors": sorted({str(sample["status"]) for sample in samples if not sample["ok"]}),
+    }
+
+
+def compare(report: dict, baseline: dict):
+    print("\nChange against baseline:")
+    for key in ("throughput_rps", "latency_p50", "latency_p95", "latency_p99", "peak_rss_bytes"):
+        old, new = baseline.get("results", {}).get(key), report["results"].get(key)
+        if old and new is not None:
+            print(f"  {key:16} {old:12.3f} -> {new:12.3f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Benchmark an already running service instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the service started by the benchmark")
+    parser.add_argument("--requests", type=int, default=40, help="Total /extract calls")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent in-flight requests")
+    parser.add_argument("--pages", default="small,huge,js,images", help="Comma-separated fixture pages to cycle through")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mock DeepSeek seconds to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=50.0, help="Mock DeepSeek output rate")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Extra environment for the started service")
+    parser.add_argument("--output", help="Report path (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    fixture_server, fixture_urls = start_fixture_server()
+    pages = {page.strip() for page in args.pages.split(",")}
+    urls = [url for url in fixture_urls if url.rsplit("/", 1)[-1].split(".")[0] in pages]
+    llm_settings = MockLLMSettings(args.llm_latency, args.llm_tokens_per_second)
+    llm_server, llm_base_url = start_mock_llm(llm_settings)
+
+    service = None
+    target = args.target
+    if not target:
+        env_overrides = dict(item.split("=", 1) for item in args.env)
+        # Every run should hit the LLM, otherwise repeated pages only measure the cache
+        env_overrides.setdefault("LLM_CACHE_BACKEND", "none")
+        env_overrides.setdefault("RECRAWL_BACKEND", "none")
+        env_overrides.setdefault("NEARDUP_ENABLED", "false")
+        # All fixture pages live on one host; politeness limits would cap the load at one site's share
+        env_overrides.setdefault("HOST_MAX_CONCURRENCY", str(args.concurrency))
+        env_overrides.setdefault("HOST_MIN_DELAY", "0")
+        service = start_service(args.port, llm_base_url, env_overrides)
+        target = f"http://127.0.0.1:{args.port}"
+
+    try:
+        wait_until_ready(target)
+        sampler = ResourceSampler(service.pid if service else None)
+        sampler.start()
+        start = time.perf_counter()
+        samples = run_load(target, urls, args.requests, args.concurrency, "benchmark-key", args.timeout)
+        wall_time = time.perf_counter() - start
+        sampler.stop()
+        health = requests.get(f"{target}/health", timeout=5).json()
+    finally:
+        if service:
+            service.terminate()
+            service.wait(timeout=30)
+        fixture_server.shutdown()
+        llm_server.shutdown()
+
+    results = summarize(samples, wall_time)
+    results["peak_rss_bytes"] = sampler.peak_rss or None
+    results["peak_browser_processes"] = sampler.peak_browser_processes if service else None
+    results["browser_restarts"] = health.get("browser", {}).get("restarts")
+    results["llm_calls"] = llm_settings.requests
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nReport written to {output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
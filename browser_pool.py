@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Optional
+
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+
+from metrics import BROWSER_PAGES, stage
+
+logger = logging.getLogger(__name__)
+
+# Substrings of Playwright/crawl4ai error messages that mean the browser itself
+# is gone, as opposed to a single page failing to load.
+BROWSER_CRASH_MARKERS = (
+    "browser has been closed",
+    "browser has disconnected",
+    "target page, context or browser has been closed",
+    "target closed",
+    "connection closed",
+)
+
+
+def is_browser_crash(message: Optional[str]) -> bool:
+    if not message:
+        return False
+    message = message.lower()
+    return any(marker in message for marker in BROWSER_CRASH_MARKERS)
+
+
+class BrowserPool:
+    """
+    One long-lived AsyncWebCrawler shared by all requests.
+
+    At most `max_pages` crawls run on the browser at the same time. After
+    `recycle_after` pages, or as soon as a crawl reports that the browser
+    crashed, new crawls wait while the in-flight ones drain and the browser is
+    restarted.
+
+    Admission of new pages can be paused (e.g. under memory pressure); waiting
+    crawls then stay queued until it is resumed.
+
+    `hooks` are crawl4ai crawler strategy hooks (name -> function), installed
+    on every browser the pool launches.
+    """
+
+    def __init__(self, browser_config: BrowserConfig, max_pages: int = 4, recycle_after: int = 200,
+                 hooks: Optional[Dict[str, Callable]] = None):
+        self.browser_config = browser_config
+        self.hooks = hooks or {}
+        self.max_pages = max(1, max_pages)
+        self.recycle_after = max(1, recycle_after)
+
+        self.active_pages = 0
+        self.pages_served = 0
+        self.restarts = 0
+
+        self._crawler: Optional[AsyncWebCrawler] = None
+        self._needs_restart = False
+        self._admitting = True
+        self._closed = False
+        self._cond = asyncio.Condition()
+
+    async def start(self):
+        async with self._cond:
+            self._closed = False
+            if self._crawler is None:
+                await self._launch()
+
+    async def close(self):
+        async with self._cond:
+            self._closed = True
+            # Let in-flight crawls finish before tearing the browser down
+            await self._cond.wait_for(lambda: self.active_pages == 0)
+            await self._shutdown()
+            self._cond.notify_all()
+
+    def mark_broken(self):
+        """Schedule a browser restart once the in-flight crawls have drained."""
+        self._needs_restart = True
+
+    async def pause_admission(self):
+        """Let in-flight crawls finish but start no new ones until resume_admission()."""
+        async with self._cond:
+            self._admitting = False
+
+    async def resume_admission(self):
+        async with self._cond:
+            if not self._admitting:
+                self._admitting = True
+                self._cond.notify_all()
+
+    async def recycle(self):
+        """Restart the browser once the in-flight crawls have drained, or now if there are none."""
+        async with self._cond:
+            self._needs_restart = True
+            if self.active_pages == 0 and self._crawler is not None and not self._closed:
+                await self._restart()
+                self._cond.notify_all()
+
+    async def arun(self, url: str, config: CrawlerRunConfig):
+        with stage("browser_acquire"):
+            crawler = await self._acquire()
+        try:
+            with stage("page_load"):
+                result = await crawler.arun(url=url, config=config)
+        except Exception as e:
+            if is_browser_crash(str(e)):
+                self.mark_broken()
+            raise
+        finally:
+            await self._release()
+
+        if not result.success and is_browser_crash(result.error_message):
+            self.mark_broken()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "running": self._crawler is not None,
+            "active_pages": self.active_pages,
+            "max_pages": self.max_pages,
+            "pages_served": self.pages_served,
+            "recycle_after": self.recycle_after,
+            "restarts": self.restarts,
+            "admitting": self._admitting,
+        }
+
+    async def _acquire(self) -> AsyncWebCrawler:
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is shut down")
+                if self._needs_restart and self.active_pages == 0:
+                    await self._restart()
+                elif self._crawler is None:
+                    await self._launch()
+                if not self._needs_restart and self._admitting and self.active_pages < self.max_pages:
+                    break
+                await self._cond.wait()
+
+            self.active_pages += 1
+            self.pages_served += 1
+            BROWSER_PAGES.inc()
+            if self.pages_served >= self.recycle_after:
+                self._needs_restart = True
+            return self._crawler
+
+    async def _release(self):
+        async with self._cond:
+            self.active_pages -= 1
+            # Restart as soon as the last crawl drains rather than on the next acquire,
+            # so a browser recycled to free memory does not sit idle holding it
+            if self._needs_restart and self.active_pages == 0 and self._crawler is not None and not self._closed:
+                try:
+                    await self._restart()
+                except Exception:
+                    logger.warning("Browser restart failed; retrying on the next crawl", exc_info=True)
+            self._cond.notify_all()
+
+    async def _launch(self):
+        crawler = AsyncWebCrawler(config=self.browser_config)
+        for name, hook in self.hooks.items():
+            crawler.crawler_strategy.set_hook(name, hook)
+        await crawler.start()
+        self._crawler = crawler
+        self.pages_served = 0
+        self._needs_restart = False
+
+    async def _shutdown(self):
+        crawler, self._crawler = self._crawler, None
+        if crawler is None:
+            return
+        try:
+            await crawler.close()
+        except Exception:
+            # A crashed browser often fails to close cleanly; it is being replaced anyway
+            logger.warning("Error while closing browser", exc_info=True)
+
+    async def _restart(self):
+        logger.info("Recycling browser after %d pages", self.pages_served)
+        await self._shutdown()
+        await self._launch()
+        self.restarts += 1
@@ -0,0 +1,216 @@
+import asyncio
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Preferred first when the client accepts several equally
+SUPPORTED_ENCODINGS = tuple(
+    name for name, available in (("zstd", zstandard is not None), ("br", brotli is not None), ("gzip", True)) if available
+)
+
+# Media types worth compressing; everything else (images, archives) is sent as is
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+# Bodies above this size are compressed on a worker thread instead of the event loop
+THREAD_THRESHOLD = 256 * 1024
+
+# Some brotli decoders (the brotli package's Decompressor, used by httpx) hand out at most
+# ~32 KB per input chunk and sit on the rest until more arrives, which stalls a stream;
+# streamed bodies therefore use the client's best other encoding
+STREAM_ENCODINGS = ("zstd", "gzip")
+
+
+class _Gzip:
+    def __init__(self):
+        # wbits 31: gzip container; level 5 is most of level 9's ratio at a fraction of the CPU
+        self._obj = zlib.compressobj(5, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=4)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+COMPRESSORS = {"gzip": _Gzip, "br": _Brotli, "zstd": _Zstd}
+
+
+def negotiate(accept_encoding: str, supported: Tuple[str, ...] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding header, or None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in supported:
+        q = weights.get(name, weights.get("*", 0.0))
+        # Strictly greater: ties go to the encoding listed first in `supported`
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _compress_all(encoding: str, body: bytes) -> bytes:
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(body) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with zstd, brotli or gzip, whichever
+    the client's Accept-Encoding prefers (zstd and brotli only when their
+    packages are installed).
+
+    A body sent in one piece is compressed only if it has at least
+    `minimum_size` bytes. Streamed bodies (NDJSON batches, event streams) are
+    compressed chunk by chunk with zstd or gzip and flushed after each one, so
+    every line still reaches the client as soon as it is written.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, encodings: Tuple[str, ...] = SUPPORTED_ENCODINGS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = tuple(name for name in encodings if name in SUPPORTED_ENCODINGS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        stream_encoding = negotiate(accept_encoding, tuple(name for name in self.encodings if name in STREAM_ENCODINGS))
+
+        await self.app(scope, receive, _Responder(send, encoding, stream_encoding, self.minimum_size).send)
+
+
+class _Responder:
+    """Rewrites one response on its way out."""
+
+    def __init__(self, send, encoding: str, stream_encoding: Optional[str], minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.stream_encoding = stream_encoding
+        self.minimum_size = minimum_size
+        self._start: Optional[dict] = None
+        # None until the first body message decides; then True (compress) or False (pass through)
+        self._active: Optional[bool] = None
+        self._compressor = None
+
+    async def send(self, message: dict):
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._active is None:
+            self._active = self._should_compress(body, more_body)
+            if not self._active:
+                await self._send(self._start)
+            elif not more_body:
+                # Whole body at once: compress it in one go and give it a length
+                if len(body) > THREAD_THRESHOLD:
+                    body = await asyncio.to_thread(_compress_all, self.encoding, body)
+                else:
+                    body = _compress_all(self.encoding, body)
+                await self._send(self._with_headers(self._start, len(body)))
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            else:
+                self.encoding = self.stream_encoding
+                self._compressor = COMPRESSORS[self.encoding]()
+                await self._send(self._with_headers(self._start, None))
+
+        if not self._active:
+            await self._send(message)
+            return
+
+        data = self._compressor.compress(body) if body else b""
+        if not more_body:
+            data += self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _should_compress(self, body: bytes, more_body: bool) -> bool:
+        if self._start["status"] < 200 or self._start["status"] in (204, 304):
+            return False
+        content_type = b""
+        for name, value in self._start.get("headers", []):
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        if not content_type.decode("latin-1").lower().startswith(COMPRESSIBLE_TYPES):
+            return False
+        if more_body:
+            return self.stream_encoding is not None
+        return len(body) >= self.minimum_size
+
+    def _with_headers(self, start: dict, content_length: Optional[int]) -> dict:
+        headers: List[Tuple[bytes, bytes]] = []
+        vary = None
+        for name, value in start.get("headers", []):
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = value
+                continue
+            headers.append((name, value))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**start, "headers": headers}
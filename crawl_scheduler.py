@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from metrics import SCHEDULER_QUEUED, record_stage
+
+# Per-host and per-key statistics are dropped after being idle this long
+STATS_RETENTION = 300
+
+# Weight of the newest sample in the moving average of wait times
+WAIT_SMOOTHING = 0.2
+
+
+class _Waiter:
+    def __init__(self, key: str, host: str):
+        self.key = key
+        self.host = host
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _Usage:
+    """Queue depth, running crawls and recent wait for one host or one key."""
+
+    def __init__(self):
+        self.queued = 0
+        self.active = 0
+        self.started = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+        self.last_seen = time.monotonic()
+
+    def record_wait(self, wait: float):
+        self.avg_wait = wait if self.started == 0 else (1 - WAIT_SMOOTHING) * self.avg_wait + WAIT_SMOOTHING * wait
+        self.max_wait = max(self.max_wait, wait)
+        self.started += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "active": self.active,
+            "started": self.started,
+            "avg_wait": round(self.avg_wait, 3),
+            "max_wait": round(self.max_wait, 3),
+        }
+
+
+class CrawlScheduler:
+    """
+    Decides when each crawl may start.
+
+    At most `max_concurrent` crawls run at once. Per host, at most `host_limit`
+    run at once and consecutive starts are at least `host_min_delay` seconds
+    apart. Waiting crawls are queued per key (API key) and keys take turns
+    round-robin, so one key with hundreds of URLs cannot hold every slot.
+    Within a key, crawls start in submission order, except that a crawl whose
+    host is busy does not hold up the key's crawls for other hosts.
+    """
+
+    def __init__(self, max_concurrent: int = 8, host_limit: int = 2, host_min_delay: float = 0.5):
+        self.max_concurrent = max(1, max_concurrent)
+        self.host_limit = max(1, host_limit)
+        self.host_min_delay = max(0.0, host_min_delay)
+
+        self.active = 0
+        # Keys with waiting crawls, in the order they get their next turn
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._host_active: Dict[str, int] = {}
+        self._host_next_start: Dict[str, float] = {}
+        self._hosts: Dict[str, _Usage] = {}
+        self._keys: Dict[str, _Usage] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @asynccontextmanager
+    async def slot(self, key: str, host: str):
+        waiter = _Waiter(key, host)
+        self._queues.setdefault(key, deque()).append(waiter)
+        self._usage(self._hosts, host).queued += 1
+        self._usage(self._keys, key).queued += 1
+        SCHEDULER_QUEUED.inc()
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled; give the slot back
+                self._release(waiter)
+            else:
+                self._remove(waiter)
+            raise
+
+        wait = time.monotonic() - waiter.enqueued_at
+        record_stage("schedule_wait", wait)
+        self._hosts[host].record_wait(wait)
+        self._keys[key].record_wait(wait)
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        for usages in (self._hosts, self._keys):
+            for name in [name for name, usage in usages.items()
+                         if not usage.queued and not usage.active and now - usage.last_seen > STATS_RETENTION]:
+                del usages[name]
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "host_limit": self.host_limit,
+            "host_min_delay": self.host_min_delay,
+            "hosts": {host: usage.to_dict() for host, usage in self._hosts.items()},
+            "keys": {key: usage.to_dict() for key, usage in self._keys.items()},
+        }
+
+    def _usage(self, usages: Dict[str, _Usage], name: str) -> _Usage:
+        usage = usages.get(name)
+        if usage is None:
+            usage = usages[name] = _Usage()
+        usage.last_seen = time.monotonic()
+        return usage
+
+    def _dispatch(self):
+        now = time.monotonic()
+        next_wakeup = None
+        while self.active < self.max_concurrent:
+            picked = None
+            for key, queue in self._queues.items():
+                for waiter in queue:
+                    if self._host_active.get(waiter.host, 0) >= self.host_limit:
+                        continue
+                    start_at = self._host_next_start.get(waiter.host, 0.0)
+                    if start_at > now:
+                        next_wakeup = start_at if next_wakeup is None else min(next_wakeup, start_at)
+                        continue
+                    picked = waiter
+                    break
+                if picked:
+                    break
+            if picked is None:
+                break
+            self._start(picked, now)
+
+        # Something is only waiting out a host's delay: look again when it is over
+        if next_wakeup is not None and self._timer is None and self.active < self.max_concurrent:
+            self._timer = asyncio.get_running_loop().call_later(next_wakeup - now, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _start(self, waiter: _Waiter, now: float):
+        queue = self._queues[waiter.key]
+        queue.remove(waiter)
+        if queue:
+            # This key goes to the back of the line
+            self._queues.move_to_end(waiter.key)
+        else:
+            del self._queues[waiter.key]
+
+        self.active += 1
+        self._host_active[waiter.host] = self._host_active.get(waiter.host, 0) + 1
+        self._host_next_start[waiter.host] = now + self.host_min_delay
+        self._dequeued(waiter)
+        self._usage(self._hosts, waiter.host).active += 1
+        self._usage(self._keys, waiter.key).active += 1
+        waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.key]
+            self._dequeued(waiter)
+
+    def _dequeued(self, waiter: _Waiter):
+        self._usage(self._hosts, waiter.host).queued -= 1
+        self._usage(self._keys, waiter.key).queued -= 1
+        SCHEDULER_QUEUED.dec()
+
+    def _release(self, waiter: _Waiter):
+        self.active -= 1
+        remaining = self._host_active.get(waiter.host, 1) - 1
+        if remaining:
+            self._host_active[waiter.host] = remaining
+        else:
+            self._host_active.pop(waiter.host, None)
+        self._usage(self._hosts, waiter.host).active -= 1
+        self._usage(self._keys, waiter.key).active -= 1
+        # Forget delays that have already passed so the dict does not grow with every host ever seen
+        now = time.monotonic()
+        for host in [host for host, start_at in self._host_next_start.items() if start_at <= now and host not in self._host_active]:
+            del self._host_next_start[host]
+        self._dispatch()
@@ -0,0 +1,161 @@
+import logging
+import re
+from contextvars import ContextVar
+from typing import Optional
+
+from bs4 import BeautifulSoup
+from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+from crawl4ai.async_crawler_strategy import AsyncHTTPCrawlerStrategy
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Pages with less visible body text than this were almost certainly meant to be rendered by JavaScript
+MIN_BODY_TEXT = 200
+
+# A <noscript> "please enable JavaScript" notice only matters when the rest of the page is thin
+NOSCRIPT_WALL_MAX_TEXT = 1000
+
+# ids of the elements single-page app frameworks mount into
+SPA_ROOT_IDS = {"root", "app", "__next", "__nuxt", "___gatsby", "svelte", "ember-app"}
+
+SPA_ROOT_ATTRIBUTES = ("ng-app", "data-reactroot", "data-server-rendered")
+
+# Any text inside an SPA mount point beyond this means it was server-rendered
+SPA_ROOT_MAX_TEXT = 50
+
+# An empty mount point only matters when the rest of the page is thin too; a full article beside one is a widget
+SPA_PAGE_MAX_TEXT = 1000
+
+NOSCRIPT_WALL_PATTERN = re.compile(
+    r"(enable|turn on|requires?|need)\s+javascript|javascript\s+(is\s+)?(required|disabled)",
+    re.IGNORECASE
+)
+
+NON_VISIBLE_TAGS = ("script", "style", "noscript", "template", "svg")
+
+
+class _Conditional:
+    """Validators for one conditional GET, and whether the server answered 304."""
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str]):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = False
+
+
+# Conditional GET in progress in the current task, if any
+_conditional: ContextVar[Optional[_Conditional]] = ContextVar("conditional_get", default=None)
+
+
+async def _add_validators(url, request_kwargs, **kwargs):
+    # crawl4ai `before_request` hook
+    conditional = _conditional.get()
+    if conditional is None:
+        return
+    headers = request_kwargs.setdefault("headers", {})
+    if conditional.etag:
+        headers["If-None-Match"] = conditional.etag
+    if conditional.last_modified:
+        headers["If-Modified-Since"] = conditional.last_modified
+
+
+async def _note_not_modified(error, **kwargs):
+    # crawl4ai `on_error` hook: the strategy treats every non-2xx answer as an error, 304 included
+    conditional = _conditional.get()
+    if conditional is not None and getattr(error, "status_code", None) == 304:
+        conditional.not_modified = True
+
+
+def needs_javascript(html: str) -> Optional[str]:
+    """
+    Why a page fetched without a browser has to be rendered in one, or None when
+    its HTML already carries the content.
+    """
+    soup = BeautifulSoup(html or "", "lxml")
+    body = soup.body
+    if body is None:
+        return "empty_body"
+
+    noscript_wall = any(
+        NOSCRIPT_WALL_PATTERN.search(noscript.get_text(" ")) for noscript in body.find_all("noscript")
+    )
+    for tag in body.find_all(NON_VISIBLE_TAGS):
+        tag.decompose()
+    text_length = len(body.get_text(" ", strip=True))
+
+    if text_length < MIN_BODY_TEXT:
+        return "empty_body"
+
+    if text_length < SPA_PAGE_MAX_TEXT:
+        for element in body.find_all(True):
+            is_root = element.get("id") in SPA_ROOT_IDS or any(element.has_attr(name) for name in SPA_ROOT_ATTRIBUTES)
+            if is_root and len(element.get_text(" ", strip=True)) < SPA_ROOT_MAX_TEXT:
+                return "spa_root"
+
+    if noscript_wall and text_length < NOSCRIPT_WALL_MAX_TEXT:
+        return "noscript_wall"
+    return None
+
+
+class HttpFetcher:
+    """
+    Fetches pages with plain HTTP requests over a keep-alive connection pool.
+
+    Results are the same CrawlResult the browser produces (markdown, links,
+    html) since crawl4ai runs its usual scraping on the fetched HTML; only the
+    JavaScript rendering is skipped.
+    """
+
+    def __init__(self, max_connections: int = 32):
+        self.max_connections = max(1, max_connections)
+        self.pages_served = 0
+        self.not_modified = 0
+        self._crawler: Optional[AsyncWebCrawler] = None
+
+    async def start(self):
+        if self._crawler is None:
+            crawler = AsyncWebCrawler(crawler_strategy=AsyncHTTPCrawlerStrategy(max_connections=self.max_connections))
+            crawler.crawler_strategy.set_hook("before_request", _add_validators)
+            crawler.crawler_strategy.set_hook("on_error", _note_not_modified)
+            await crawler.start()
+            self._crawler = crawler
+
+    async def close(self):
+        crawler, self._crawler = self._crawler, None
+        if crawler is None:
+            return
+        try:
+            await crawler.close()
+        except Exception:
+            logger.warning("Error while closing HTTP fetcher", exc_info=True)
+
+    async def arun(self, url: str, config: CrawlerRunConfig):
+        if self._crawler is None:
+            raise RuntimeError("HTTP fetcher is not running")
+        with stage("http_fetch"):
+            result = await self._crawler.arun(url=url, config=config)
+        self.pages_served += 1
+        return result
+
+    async def fetch_if_modified(self, url: str, config: CrawlerRunConfig, etag: Optional[str], last_modified: Optional[str]):
+        """Conditional GET with the validators of an earlier fetch: None on 304, else the result as arun() gives it."""
+        conditional = _Conditional(etag, last_modified)
+        token = _conditional.set(conditional)
+        try:
+            result = await self.arun(url, config)
+        finally:
+            _conditional.reset(token)
+        if conditional.not_modified:
+            self.not_modified += 1
+            return None
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "running": self._crawler is not None,
+            "max_connections": self.max_connections,
+            "pages_served": self.pages_served,
+            "not_modified": self.not_modified,
+        }
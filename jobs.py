@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import collect_timings, record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    def __init__(self, job_id: str, key: str, owner: str, coalesced: bool):
+        self.id = job_id
+        self.key = key
+        # Whoever submitted the job; only they may read it back
+        self.owner = owner
+        # True when the job joined a crawl another job had already started
+        self.coalesced = coalesced
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+
+class _Work:
+    """One unit of queued work, shared by every job submitted for the same key."""
+
+    def __init__(self, key: str, run: Callable[[], Awaitable[Any]]):
+        self.key = key
+        self.run = run
+        self.jobs: List[Job] = []
+        self.queued_at = time.time()
+
+    def update(self, **fields):
+        for job in self.jobs:
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+
+class JobQueue:
+    """
+    Bounded job queue processed by a fixed pool of workers.
+
+    Submitting a key that is already queued or running attaches the new job to
+    the existing work instead of starting a duplicate. Finished jobs are kept
+    for `retention` seconds so clients can poll for the result, but no more
+    than `max_retained` of them, oldest finished dropped first.
+    """
+
+    def __init__(self, workers: int = 4, max_queued: int = 100, retention: float = 3600, max_retained: int = 200):
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.retention = retention
+        self.max_retained = max(0, max_retained)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Dict[str, _Work] = {}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # Ids of finished jobs, in the order they finished
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, key: str, owner: str, run: Callable[[], Awaitable[Any]]) -> Job:
+        self._purge()
+        work = self._in_flight.get(key)
+        if work is None:
+            work = _Work(key, run)
+            try:
+                self._queue.put_nowait(work)
+            except asyncio.QueueFull:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+            self._in_flight[key] = work
+            job = Job(uuid.uuid4().hex, key, owner, coalesced=False)
+        else:
+            job = Job(uuid.uuid4().hex, key, owner, coalesced=True)
+            # Join the existing work in whatever state it has reached
+            leader = work.jobs[0]
+            job.status, job.started_at = leader.status, leader.started_at
+
+        work.jobs.append(job)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queued": self.max_queued,
+            "in_flight": len(self._in_flight),
+            "jobs": len(self._jobs),
+            "finished": len(self._finished),
+        }
+
+    async def _worker(self):
+        while True:
+            work = await self._queue.get()
+            started_at = time.time()
+            work.update(status="running", started_at=started_at)
+            try:
+                with collect_timings():
+                    record_stage("queue_wait", started_at - work.queued_at)
+                    result = await work.run()
+                work.update(status="completed", result=result, finished_at=time.time())
+            except asyncio.CancelledError:
+                work.update(status="failed", error="Service shutting down", finished_at=time.time())
+                raise
+            except Exception as e:
+                logger.warning("Job %s failed", work.key, exc_info=True)
+                # HTTPException carries its message in .detail
+                error = getattr(e, "detail", None) or str(e)
+                work.update(status="failed", error=str(error), finished_at=time.time())
+            finally:
+                self._in_flight.pop(work.key, None)
+                for job in work.jobs:
+                    self._finished[job.id] = None
+                self._queue.task_done()
+                self._purge()
+
+    def _purge(self):
+        # Finished jobs are listed in the order they finished, so expired ones are at the front; unfinished ones never expire
+        cutoff = time.time() - self.retention
+        while self._finished:
+            job_id = next(iter(self._finished))
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished_at > cutoff and len(self._finished) <= self.max_retained:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
@@ -0,0 +1,176 @@
+import re
+from typing import Dict, List, Tuple
+
+from pruning import WORD_TOKEN_RATE, estimate_tokens
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+
+# How a block too long for one chunk is cut, coarsest first: (pattern, separator between the pieces)
+OVERSIZED_SPLITS = [
+    (re.compile(r"\n"), "\n"),
+    (re.compile(r"(?<=[.!?])\s+"), " "),
+    (re.compile(r"\s+"), " "),
+]
+
+# Words a chunk output must repeat from the end of the previous one before they are treated as overlap
+MIN_OVERLAP_WORDS = 8
+
+
+def _split_blocks(markdown: str) -> List[str]:
+    """Paragraph-level blocks; headings always start a new block."""
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", markdown or ""):
+        current = []
+        for line in paragraph.split("\n"):
+            if HEADING_PATTERN.match(line) and current:
+                blocks.append("\n".join(current))
+                current = []
+            current.append(line)
+        if any(line.strip() for line in current):
+            blocks.append("\n".join(current))
+    return blocks
+
+
+def _split_oversized(block: str, chunk_tokens: int, level: int = 0) -> List[Tuple[str, str]]:
+    """
+    Cut a block longer than `chunk_tokens` at line, then sentence, then word
+    boundaries, as (piece, separator before it) pairs.
+    """
+    if estimate_tokens(block) <= chunk_tokens or level == len(OVERSIZED_SPLITS):
+        return [(block, "\n\n")]
+    pattern, separator = OVERSIZED_SPLITS[level]
+    pieces: List[Tuple[str, str]] = []
+    for part in pattern.split(block):
+        if part.strip():
+            inner = _split_oversized(part, chunk_tokens, level + 1)
+            pieces.append((inner[0][0], separator))
+            pieces.extend(inner[1:])
+    # Only the first piece is a new paragraph; the rest continue it
+    return [(pieces[0][0], "\n\n")] + pieces[1:]
+
+
+def _join(pieces: List[Tuple[str, str]]) -> str:
+    return "".join(separator + text if i else text for i, (text, separator) in enumerate(pieces))
+
+
+def _tokens(words: int) -> int:
+    # estimate_tokens for a word count, so sums of small pieces are not rounded down one by one
+    return int(words * WORD_TOKEN_RATE)
+
+
+def split_markdown(markdown: str, chunk_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Split markdown into chunks of about `chunk_tokens` at heading and paragraph boundaries.
+
+    Each chunk after the first starts with the trailing paragraphs of the
+    previous one (up to `overlap_tokens`) so nothing is cut mid-thought.
+    A chunk is closed early at a heading once it is half full, to keep
+    sections together. A paragraph too long for one chunk, such as a page
+    without blank lines, is cut at line, sentence or word boundaries.
+    """
+    if estimate_tokens(markdown) <= chunk_tokens:
+        return [markdown]
+    pieces = [piece for block in _split_blocks(markdown) for piece in _split_oversized(block, chunk_tokens)]
+    if len(pieces) <= 1:
+        return [markdown]
+
+    chunks = []
+    current: List[Tuple[str, str]] = []
+    current_words = 0
+    for piece in pieces:
+        piece_words = len(piece[0].split())
+        starts_section = piece[1] == "\n\n" and bool(HEADING_PATTERN.match(piece[0]))
+        full = _tokens(current_words + piece_words) > chunk_tokens
+        if current and (full or (starts_section and _tokens(current_words) >= chunk_tokens / 2)):
+            chunks.append(_join(current))
+            # Carry the tail of this chunk into the next one
+            overlap: List[Tuple[str, str]] = []
+            overlap_words = 0
+            for previous in reversed(current):
+                size = len(previous[0].split())
+                if _tokens(overlap_words + size) > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_words += size
+            current, current_words = overlap, overlap_words
+        current.append(piece)
+        current_words += piece_words
+    if current:
+        chunks.append(_join(current))
+    return chunks
+
+
+def _normalize(block: str) -> str:
+    return " ".join(block.split()).lower()
+
+
+def _overlap_words(previous: str, block: str) -> int:
+    """Number of leading words of `block` that repeat the end of `previous`, if there are enough to be overlap."""
+    before = _normalize(previous).split()
+    after = _normalize(block).split()
+    for count in range(min(len(before), len(after)), MIN_OVERLAP_WORDS - 1, -1):
+        if before[-count:] == after[:count]:
+            return count
+    return 0
+
+
+def merge_content(parts: List[str]) -> str:
+    """Join chunk outputs in order, dropping paragraphs repeated from the previous chunk's overlap."""
+    if len(parts) == 1:
+        # Nothing to de-duplicate; keep the output exactly as written
+        return parts[0]
+    merged: List[str] = []
+    for part in parts:
+        blocks = _split_blocks(part)
+        # Overlap can only repeat the end of what we have so far
+        recent = {_normalize(block) for block in merged[-len(blocks) - 1:]}
+        start = 0
+        while start < len(blocks) and _normalize(blocks[start]) in recent:
+            start += 1
+        if merged and start < len(blocks):
+            # A paragraph cut between chunks repeats only its overlapping sentences; continue it instead
+            count = _overlap_words(merged[-1], blocks[start])
+            if count:
+                repeated = re.match(r"\s*(?:\S+\s+){%d}\S+(\s*)" % (count - 1), blocks[start])
+                rest = blocks[start][repeated.end():]
+                if rest:
+                    merged[-1] += ("\n" if "\n" in repeated.group(1) else " ") + rest
+                start += 1
+        merged.extend(blocks[start:])
+    return "\n\n".join(merged)
+
+
+def _unique(items: List) -> List:
+    seen = []
+    for item in items:
+        if item not in seen:
+            seen.append(item)
+    return seen
+
+
+def merge_blocks(blocks: List[dict]) -> dict:
+    """
+    Merge the schema blocks returned for each chunk, in document order.
+
+    Content is concatenated with overlap de-duplication, URL lists are
+    unioned, and the first non-empty value wins for each metadata key.
+    """
+    blocks = [block for block in blocks if isinstance(block, dict) and not block.get("error")]
+    merged: Dict = {}
+    contents = [block["content"] for block in blocks if isinstance(block.get("content"), str)]
+    if contents:
+        merged["content"] = merge_content(contents)
+
+    for field in ("main_content_image_urls", "links"):
+        values = [value for block in blocks if isinstance(block.get(field), list) for value in block[field]]
+        if values:
+            merged[field] = _unique(values)
+
+    metadata: Dict = {}
+    for block in blocks:
+        for key, value in (block.get("metadata") or {}).items():
+            if value and not metadata.get(key):
+                metadata[key] = value
+    if metadata:
+        merged["metadata"] = metadata
+    return merged
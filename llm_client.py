@@ -0,0 +1,361 @@
+import asyncio
+import email.utils
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+from crawl4ai.prompts import PROMPT_EXTRACT_SCHEMA_WITH_INSTRUCTION
+from crawl4ai.utils import escape_json_string, extract_xml_data, sanitize_html, split_and_parse_json_objects
+
+from metrics import LLM_BACKOFFS, LLM_HEDGES, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+
+# Statuses worth another attempt; everything else is the request's own fault
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Latencies kept per key for the hedging threshold
+LATENCY_WINDOW = 200
+# Hedge only once there are enough samples for a meaningful p95
+MIN_HEDGE_SAMPLES = 20
+
+
+class LLMError(Exception):
+    """A chat completion call that failed for good (after any retries)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _RetryableError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None, overload: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        # 429 and timeouts mean we are sending too much; other retryable errors do not
+        self.overload = overload
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by about one slot per window of successful
+    calls, halves on overload (429 or timeout), at most once per `cooldown`
+    seconds so a burst of failures from the same moment counts once.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None, cooldown: float = 2.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial or self.max_limit)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def try_acquire(self) -> bool:
+        # For optional extra work (hedges): take a free slot or do without
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def on_success(self):
+        async with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_overload(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit / 2)
+            LLM_BACKOFFS.inc()
+
+
+class LLMClient:
+    """
+    Chat completion client for one API key.
+
+    All clients share one keep-alive connection pool (`http`). Each key has its
+    own adaptive concurrency limit and latency history. Failed calls with a
+    retryable status, a timeout or a connection error are retried with
+    jittered exponential backoff, waiting at least as long as Retry-After asks.
+    With `hedge` on, a call still running past the key's p95 latency gets a
+    second identical request if a slot is free, and the first answer wins.
+
+    Given `on_delta`, the completion is streamed and each piece of text is passed
+    on as it arrives. A streamed call is never hedged, and once text has been
+    passed on it is not retried either.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, api_key: str, model: str, base_url: str, max_concurrency: int = 8,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0, hedge: bool = False):
+        self.http = http
+        self.api_key = api_key
+        self.model = model
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "p95_latency": round(p95, 3) if p95 is not None else None,
+        }
+
+    async def complete(self, prompt: str, on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> Tuple[str, dict]:
+        """Message content and token usage of a completion, retried as needed. Raises LLMError."""
+        payload = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "temperature": 0.01}
+        delivered = False
+        if on_delta is not None:
+            payload.update(stream=True, stream_options={"include_usage": True})
+
+            async def forward(text: str):
+                nonlocal delivered
+                delivered = True
+                await on_delta(text)
+
+        attempt = 0
+        while True:
+            try:
+                async with self.limiter.slot():
+                    if on_delta is not None:
+                        result = await self._stream(payload, forward)
+                    else:
+                        result = await self._attempt(payload)
+                await self.limiter.on_success()
+                return result
+            except _RetryableError as e:
+                if e.overload:
+                    self.limiter.on_overload()
+                # The caller has already seen part of this answer; a retry would repeat it
+                if attempt >= self.max_retries or delivered:
+                    raise LLMError(str(e), e.status, e.retry_after) from None
+                # Full jitter, but never sooner than the server asked for
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, self.backoff_max))
+                attempt += 1
+                LLM_RETRIES.labels(reason=str(e.status or "network")).inc()
+                logger.info("LLM call failed (%s), retry %d in %.1fs", e, attempt, delay)
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, payload: dict) -> Tuple[str, dict]:
+        threshold = self.p95() if self.hedge else None
+        if threshold is None:
+            return await self._post(payload)
+
+        primary = asyncio.create_task(self._post(payload))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done or not self.limiter.try_acquire():
+                return await primary
+
+            # The call is slower than 95% of recent ones: race it against a second request
+            LLM_HEDGES.inc()
+            hedge = asyncio.create_task(self._post(payload))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed; report the original request's error
+            return primary.result()
+        finally:
+            primary.cancel()
+            if hedge is not None:
+                hedge.cancel()
+                await self.limiter.release()
+
+    async def _post(self, payload: dict) -> Tuple[str, dict]:
+        start = time.monotonic()
+        try:
+            response = await self.http.post(self.url, json=payload, headers={"Authorization": f"Bearer {self.api_key}"})
+        except httpx.TimeoutException as e:
+            raise _RetryableError(f"LLM request timed out: {e!r}", overload=True)
+        except httpx.TransportError as e:
+            raise _RetryableError(f"LLM connection error: {e!r}")
+
+        if response.status_code != 200:
+            self._raise_for_status(response)
+
+        self._latencies.append(time.monotonic() - start)
+        try:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise _RetryableError(f"Malformed LLM response: {e!r}")
+        return content, data.get("usage") or {}
+
+    async def _stream(self, payload: dict, on_delta: Callable[[str], Awaitable[None]]) -> Tuple[str, dict]:
+        start = time.monotonic()
+        pieces = []
+        usage: dict = {}
+        try:
+            async with self.http.stream("POST", self.url, json=payload, headers={"Authorization": f"Bearer {self.api_key}"}) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    self._raise_for_status(response)
+                # Server-sent events: one "data: {json}" line per chunk, "data: [DONE]" at the end
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError as e:
+                        raise _RetryableError(f"Malformed LLM stream: {e!r}")
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        text = (choice.get("delta") or {}).get("content")
+                        if text:
+                            pieces.append(text)
+                            await on_delta(text)
+        except httpx.TimeoutException as e:
+            raise _RetryableError(f"LLM request timed out: {e!r}", overload=True)
+        except httpx.TransportError as e:
+            raise _RetryableError(f"LLM connection error: {e!r}")
+
+        self._latencies.append(time.monotonic() - start)
+        return "".join(pieces), usage
+
+    def _raise_for_status(self, response: httpx.Response):
+        message = f"LLM request failed with HTTP {response.status_code}: {response.text[:500]}"
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if response.status_code in RETRYABLE_STATUSES:
+            raise _RetryableError(message, response.status_code, retry_after, overload=response.status_code == 429)
+        raise LLMError(message, response.status_code, retry_after)
+
+
+class LLMClientPool:
+    """
+    One LLMClient per API key (least recently used dropped beyond `max_clients`),
+    all sending through a single pooled httpx client.
+    """
+
+    def __init__(self, model: str, base_url: Optional[str] = None, max_clients: int = 256, max_connections: int = 100,
+                 timeout: float = 120.0, **client_options):
+        self.model = model
+        self.base_url = base_url or DEFAULT_BASE_URL
+        self.max_clients = max(1, max_clients)
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.client_options = client_options
+        self.http: Optional[httpx.AsyncClient] = None
+        self._clients: "OrderedDict[str, LLMClient]" = OrderedDict()
+
+    async def start(self):
+        if self.http is None:
+            self.http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=60.0)
+            )
+
+    async def close(self):
+        http, self.http = self.http, None
+        self._clients.clear()
+        if http is not None:
+            await http.aclose()
+
+    async def get(self, api_key: str) -> LLMClient:
+        await self.start()
+        client = self._clients.get(api_key)
+        if client is None:
+            client = self._clients[api_key] = LLMClient(self.http, api_key, self.model, self.base_url, **self.client_options)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(api_key)
+        return client
+
+    def stats(self) -> Dict[str, dict]:
+        # Keys are shown as a short hash, like the scheduler does
+        return {hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]: client.stats() for key, client in self._clients.items()}
+
+
+def extraction_prompt(url: str, content: str, schema: dict, instruction: str) -> str:
+    # Same prompt crawl4ai's LLMExtractionStrategy sends for schema extraction
+    values = {
+        "URL": url,
+        "HTML": escape_json_string(sanitize_html(content)),
+        "REQUEST": instruction,
+        "SCHEMA": json.dumps(schema, indent=2),
+    }
+    prompt = PROMPT_EXTRACT_SCHEMA_WITH_INSTRUCTION
+    for name, value in values.items():
+        prompt = prompt.replace("{" + name + "}", value)
+    return prompt
+
+
+def parse_blocks(content: str) -> list:
+    """Blocks from a `<blocks>[...]</blocks>` answer, with crawl4ai's fallback for broken JSON."""
+    try:
+        blocks = json.loads(extract_xml_data(["blocks"], content)["blocks"])
+        if isinstance(blocks, dict):
+            blocks = [blocks]
+        for block in blocks:
+            block["error"] = False
+        return blocks
+    except Exception:
+        parsed, unparsed = split_and_parse_json_objects(content)
+        if unparsed:
+            parsed.append({"index": 0, "error": True, "tags": ["error"], "content": unparsed})
+        return parsed
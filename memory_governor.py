@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+from typing import Optional, Tuple
+
+from browser_pool import BrowserPool
+from metrics import MEMORY_PRESSURE, MEMORY_RECYCLES, api_rss, browser_rss
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+STATE_LEVELS = {"ok": 0, "soft": 1, "hard": 2}
+
+
+class MemoryGovernor:
+    """
+    Keeps the API process and its browser under a memory budget.
+
+    RSS (API process + browser processes) is sampled every `interval` seconds:
+
+    - above `soft_limit` the browser pool stops admitting new pages; waiting
+      crawls stay queued, and once the in-flight pages have finished the
+      browser is restarted to give its memory back;
+    - above `hard_limit` the browser is restarted as soon as the pages already
+      running have finished, whatever else is going on.
+
+    If memory is still over the limit right after a restart, the browser is not
+    what is using it; admission is resumed rather than stalling requests forever.
+    A limit of 0 disables that check.
+    """
+
+    def __init__(self, pool: BrowserPool, soft_limit: int, hard_limit: int, interval: float = 2.0):
+        self.pool = pool
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.interval = interval
+
+        self.state = "ok"
+        self.api_rss = 0
+        self.browser_rss = 0
+        self.recycles = 0
+
+        # Set when the governor restarted the browser and memory stayed high anyway
+        self._browser_not_the_cause = False
+        self._recycled_at_restarts: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.soft_limit or self.hard_limit)
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "api_rss_bytes": self.api_rss,
+            "browser_rss_bytes": self.browser_rss,
+            "soft_limit_bytes": self.soft_limit or None,
+            "hard_limit_bytes": self.hard_limit or None,
+            "recycles": self.recycles,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.warning("Memory check failed", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def check(self):
+        # Walking the process tree is a few syscalls per process; keep it off the event loop
+        self.api_rss, self.browser_rss = await asyncio.to_thread(_sample)
+        total = self.api_rss + self.browser_rss
+
+        if self.hard_limit and total >= self.hard_limit:
+            state = "hard"
+        elif self.soft_limit and total >= self.soft_limit:
+            state = "soft"
+        else:
+            state = "ok"
+
+        if state != self.state:
+            logger.info("Memory %s: %d MB (api %d MB, browser %d MB)",
+                        state, total // MB, self.api_rss // MB, self.browser_rss // MB)
+        self.state = state
+        MEMORY_PRESSURE.set(STATE_LEVELS[state])
+
+        if state == "ok":
+            self._browser_not_the_cause = False
+            self._recycled_at_restarts = None
+            await self.pool.resume_admission()
+            return
+
+        # A restart we asked for has happened and memory is still over the limit
+        if self._recycled_at_restarts is not None and self.pool.restarts > self._recycled_at_restarts:
+            if not self._browser_not_the_cause:
+                logger.warning("Memory still %s after restarting the browser; admitting pages again", state)
+            self._browser_not_the_cause = True
+        if self._browser_not_the_cause:
+            await self.pool.resume_admission()
+            return
+
+        await self.pool.pause_admission()
+        if self._recycled_at_restarts is None and (state == "hard" or self.pool.active_pages == 0):
+            # Hard: restart as soon as the running pages drain. Soft: once nothing is running.
+            self._recycled_at_restarts = self.pool.restarts
+            self.recycles += 1
+            MEMORY_RECYCLES.inc()
+            await self.pool.recycle()
+
+
+def _sample() -> Tuple[int, int]:
+    return api_rss(), browser_rss()
+
+
+def governor_from_env(pool: BrowserPool) -> MemoryGovernor:
+    """Build the governor from MEMORY_SOFT_LIMIT_MB, MEMORY_HARD_LIMIT_MB and MEMORY_CHECK_INTERVAL."""
+    return MemoryGovernor(
+        pool,
+        soft_limit=int(float(os.getenv("MEMORY_SOFT_LIMIT_MB", "1400")) * MB),
+        hard_limit=int(float(os.getenv("MEMORY_HARD_LIMIT_MB", "1700")) * MB),
+        interval=float(os.getenv("MEMORY_CHECK_INTERVAL", "2"))
+    )
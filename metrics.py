@@ -0,0 +1,179 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import psutil
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "crawl4ai_stage_seconds",
+    "Time spent in each stage of the extraction pipeline",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "crawl4ai_llm_tokens_total",
+    "Tokens used by LLM extraction calls",
+    ["kind"]
+)
+LLM_RETRIES = Counter(
+    "crawl4ai_llm_retries_total",
+    "DeepSeek calls retried, by HTTP status (or \"network\")",
+    ["reason"]
+)
+LLM_BACKOFFS = Counter(
+    "crawl4ai_llm_backoffs_total",
+    "Times a per-key DeepSeek concurrency limit was halved after a 429 or timeout"
+)
+LLM_HEDGES = Counter(
+    "crawl4ai_llm_hedges_total",
+    "Second requests sent for DeepSeek calls running past their p95 latency"
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "crawl4ai_requests_in_flight",
+    "URLs currently being extracted, across /extract, batches and jobs"
+)
+SCHEDULER_ACTIVE = Gauge(
+    "crawl4ai_scheduler_active",
+    "Crawls the scheduler has let start and that are still running"
+)
+SCHEDULER_QUEUED = Gauge(
+    "crawl4ai_scheduler_queued",
+    "Crawls waiting for their turn in the per-host / per-key scheduler"
+)
+BROWSER_ACTIVE_PAGES = Gauge(
+    "crawl4ai_browser_active_pages",
+    "Pages currently open on the shared browser"
+)
+BROWSER_PAGES = Counter(
+    "crawl4ai_browser_pages_total",
+    "Pages crawled with the shared browser"
+)
+FETCHES = Counter(
+    "crawl4ai_fetches_total",
+    "Pages fetched, by the path that produced the result",
+    ["path"]
+)
+RECRAWLS = Counter(
+    "crawl4ai_recrawls_total",
+    "Crawls of a URL crawled before, by outcome (not_modified, unchanged, changed)",
+    ["outcome"]
+)
+NEAR_DUPLICATES = Counter(
+    "crawl4ai_near_duplicates_total",
+    "Extractions reused from a near-duplicate page under another URL instead of calling the LLM"
+)
+FETCH_ESCALATIONS = Counter(
+    "crawl4ai_fetch_escalations_total",
+    "Plain HTTP fetches that had to be redone in the browser",
+    ["reason"]
+)
+BLOCKED_REQUESTS = Counter(
+    "crawl4ai_blocked_requests_total",
+    "Browser requests aborted by resource blocking, by resource type or \"tracker\"",
+    ["reason"]
+)
+MEMORY_PRESSURE = Gauge(
+    "crawl4ai_memory_pressure",
+    "Memory governor state: 0 ok, 1 above the soft limit (no new browser pages), 2 above the hard limit"
+)
+MEMORY_RECYCLES = Counter(
+    "crawl4ai_memory_recycles_total",
+    "Browser restarts triggered by the memory governor"
+)
+PROCESS_RSS = Gauge(
+    "crawl4ai_process_rss_bytes",
+    "Resident memory of the API process and of the browser processes it started",
+    ["process"]
+)
+
+# Stage timings of the extraction running in the current task, if anyone is collecting them
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+_process = psutil.Process(os.getpid())
+
+
+def api_rss() -> int:
+    return _process.memory_info().rss
+
+
+def browser_rss() -> int:
+    """Combined RSS of every process the API started (the browser and its helpers)."""
+    total = 0
+    for child in _process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            # Child exited while we were looking
+            continue
+    return total
+
+
+PROCESS_RSS.labels(process="api").set_function(api_rss)
+PROCESS_RSS.labels(process="browser").set_function(browser_rss)
+
+
+@contextmanager
+def collect_timings():
+    """Collect the stage timings recorded by the current task (and tasks it starts) into a dict."""
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current_timings() -> Optional[Dict[str, float]]:
+    return _timings.get()
+
+
+def record_stage(name: str, seconds: float):
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def track_in_flight(func):
+    """Count calls of an async function in REQUESTS_IN_FLIGHT while they run."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+    return wrapper
+
+
+def record_llm_usage(usage: Optional[dict]):
+    # The "usage" object of a chat completion response
+    if not usage:
+        return
+    LLM_TOKENS.labels(kind="prompt").inc(usage.get("prompt_tokens") or 0)
+    LLM_TOKENS.labels(kind="completion").inc(usage.get("completion_tokens") or 0)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, durations in milliseconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def render() -> bytes:
+    return generate_latest()
+
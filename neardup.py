@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from llm_cache import ExtractionCache, SQLiteCacheBackend
+from metrics import NEAR_DUPLICATES
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+# Consecutive words hashed together; single words would make any two articles on a topic look alike
+SHINGLE_WORDS = 3
+
+WORD_RE = re.compile(r"\w+")
+# Link and image targets differ between copies of a story on different sites, so they are left out of the fingerprint
+URL_RE = re.compile(r"\w+://\S+")
+
+# Bumped when the snapshot layout changes; other versions are ignored on load
+SNAPSHOT_VERSION = 2
+
+
+def simhash(text: str, min_words: int = 50) -> Optional[int]:
+    """64-bit SimHash of a text's word shingles, or None if it is too short to compare reliably."""
+    words = WORD_RE.findall(URL_RE.sub(" ", text).lower())
+    if len(words) < max(min_words, SHINGLE_WORDS):
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = [
+        format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for shingle in shingles
+    ]
+    # Each bit is set if most shingles have it set; counting columns of bit strings keeps this out of a Python loop per bit
+    half = len(hashes) / 2
+    bits = "".join("1" if column.count("1") > half else "0" for column in zip(*hashes))
+    return int(bits, 2)
+
+
+class NearDuplicate(NamedTuple):
+    url: str
+    # Number of differing SimHash bits
+    distance: int
+    # The extraction's blocks, as the extraction cache holds them
+    blocks: list
+
+
+class NearDuplicateIndex:
+    """
+    SimHash fingerprints of the main text of pages extracted before, so a page
+    carrying the same story under another URL (wire copy, syndicated
+    newsletters) can reuse that extraction instead of calling DeepSeek again.
+
+    Only fingerprints are kept in memory, at most `max_entries` of them, least
+    recently used dropped first. Each points at its page's entry in the
+    extraction cache, which holds the extraction itself, so an extraction the
+    cache has dropped can no longer be reused. Pages match when their fingerprints differ in at most
+    `max_distance` of 64 bits. Fingerprints are split into `max_distance + 1`
+    bands, one of which two matching fingerprints must share, so a lookup only
+    compares against the entries sharing a band.
+    """
+
+    def __init__(self, cache: ExtractionCache, max_distance: int = 3, max_entries: int = 10000, min_words: int = 50,
+                 snapshot_path: Optional[str] = None, snapshot_interval: float = 300):
+        if not 0 <= max_distance < 16:
+            raise ValueError(f"max_distance must be between 0 and 15, got {max_distance}")
+        self.cache = cache
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.min_words = min_words
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        # (bit offset, width) of each band
+        band_bits = HASH_BITS // (max_distance + 1)
+        self._bands: List[Tuple[int, int]] = [
+            (offset, band_bits if i < max_distance else HASH_BITS - offset)
+            for i, offset in enumerate(range(0, band_bits * (max_distance + 1), band_bits))
+        ]
+        # key -> (fingerprint, url, variant, extraction cache key)
+        self._entries: "OrderedDict[str, Tuple[int, str, str, str]]" = OrderedDict()
+        # One table per band: band value -> keys of the entries with it; nearly always one, and a list is a third of a set's size
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in self._bands]
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self.reused = 0
+        self.indexed = 0
+
+    @staticmethod
+    def make_key(url: str, variant: str = "") -> str:
+        return hashlib.sha256(f"{url}\0{variant}".encode("utf-8")).hexdigest()
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        return simhash(text, self.min_words)
+
+    def _band_values(self, value: int):
+        for offset, width in self._bands:
+            yield (value >> offset) & ((1 << width) - 1)
+
+    def _insert(self, key: str, value: int, url: str, variant: str, cache_key: str):
+        self._remove(key)
+        self._entries[key] = (value, url, variant, cache_key)
+        for table, band in zip(self._tables, self._band_values(value)):
+            table.setdefault(band, []).append(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table, band in zip(self._tables, self._band_values(entry[0])):
+            keys = table.get(band)
+            if keys is not None and key in keys:
+                keys.remove(key)
+                if not keys:
+                    del table[band]
+
+    async def find(self, value: int, url: str, variant: str = "") -> Optional[NearDuplicate]:
+        """The closest extraction of another URL with the same variant within `max_distance`, if any."""
+        candidates = set()
+        for table, band in zip(self._tables, self._band_values(value)):
+            candidates.update(table.get(band, ()))
+
+        matches = []
+        for key in candidates:
+            other, other_url, other_variant, cache_key = self._entries[key]
+            # The same URL changing slightly is an edit, which should be extracted again
+            if other_url == url or other_variant != variant:
+                continue
+            distance = (value ^ other).bit_count()
+            if distance <= self.max_distance:
+                matches.append((distance, key, other_url, cache_key))
+
+        for distance, key, other_url, cache_key in sorted(matches):
+            blocks = await self._get(cache_key)
+            # An add() while the cache was read may have evicted or replaced the entry
+            entry = self._entries.get(key)
+            current = entry is not None and entry[3] == cache_key
+            if blocks is None:
+                # Expired from or evicted by the extraction cache, or lost with it on a restart
+                if current:
+                    self._remove(key)
+                    self._dirty = True
+                continue
+            if current:
+                self._entries.move_to_end(key)
+            self.reused += 1
+            NEAR_DUPLICATES.inc()
+            return NearDuplicate(url=other_url, distance=distance, blocks=blocks)
+        return None
+
+    def add(self, value: int, url: str, cache_key: str, variant: str = ""):
+        """Index a page whose extraction is in the extraction cache under `cache_key`."""
+        self._insert(self.make_key(url, variant), value, url, variant, cache_key)
+        self._dirty = True
+        self.indexed += 1
+
+    async def _get(self, cache_key: str) -> Optional[Any]:
+        # Straight from the backend, so lookups here don't count as cache hits or misses
+        backend = self.cache.backend
+        if backend.blocking:
+            value = await asyncio.to_thread(backend.get, cache_key)
+        else:
+            value = backend.get(cache_key)
+        return None if value is None else json.loads(value)
+
+    def load(self):
+        """Read the fingerprints saved by save(), if there is a snapshot."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                logger.info("Ignoring near-duplicate snapshot %s of another version", self.snapshot_path)
+                return
+            for key, value, url, variant, cache_key in snapshot["entries"]:
+                self._insert(key, int(value, 16), url, variant, cache_key)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Start empty rather than not at all; the index refills as pages are extracted
+            logger.warning("Ignoring unreadable near-duplicate snapshot %s", self.snapshot_path, exc_info=True)
+            return
+        logger.info("Loaded %d near-duplicate fingerprints from %s", len(self._entries), self.snapshot_path)
+
+    def save(self):
+        """Write the fingerprints to the snapshot file, oldest first, replacing it atomically."""
+        if not self.snapshot_path:
+            return
+        entries = [
+            [key, format(value, "016x"), url, variant, cache_key]
+            for key, (value, url, variant, cache_key) in self._entries.items()
+        ]
+        self._dirty = False
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.snapshot_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "entries": entries}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporary, self.snapshot_path)
+
+    async def start(self):
+        await asyncio.to_thread(self.load)
+        if self.snapshot_path and self.snapshot_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._dirty:
+            await self._save()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if self._dirty:
+                await self._save()
+
+    async def _save(self):
+        try:
+            await asyncio.to_thread(self.save)
+        except OSError:
+            logger.warning("Near-duplicate snapshot failed", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "indexed": self.indexed,
+            "reused": self.reused,
+            "snapshot": self.snapshot_path,
+        }
+
+
+def create_index_from_env(cache: Optional[ExtractionCache]) -> Optional[NearDuplicateIndex]:
+    """Build the near-duplicate index from NEARDUP_* environment variables, or None if disabled."""
+    if os.getenv("NEARDUP_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if cache is None:
+        # The index only points at extractions; without the extraction cache there is nothing to reuse
+        logger.info("Near-duplicate detection is off because the LLM cache is disabled")
+        return None
+    snapshot_path = None
+    # Fingerprints are only worth keeping across restarts when the extractions they point at are
+    if isinstance(cache.backend, SQLiteCacheBackend):
+        snapshot_path = os.getenv("NEARDUP_SNAPSHOT_PATH", os.path.join(".cache", "neardup-index.json")) or None
+    return NearDuplicateIndex(
+        cache,
+        max_distance=int(os.getenv("NEARDUP_MAX_DISTANCE", "3")),
+        max_entries=int(os.getenv("NEARDUP_MAX_ENTRIES", "10000")),
+        min_words=int(os.getenv("NEARDUP_MIN_WORDS", "50")),
+        snapshot_path=snapshot_path,
+        snapshot_interval=float(os.getenv("NEARDUP_SNAPSHOT_INTERVAL", "300"))
+    )
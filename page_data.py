@@ -0,0 +1,221 @@
+import json
+import re
+from typing import Iterable, List, Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+# Images must be at least this wide to count as main content images
+MIN_IMAGE_WIDTH = 600
+
+# Viewport width used to turn `vw` units in `sizes` into pixels (matches the browser config)
+VIEWPORT_WIDTH = 1280
+
+# Elements whose images are never part of the main content
+BOILERPLATE_TAGS = ("nav", "header", "footer", "aside")
+
+# Substrings of image URLs, classes and ids that mark decorative images
+DECORATIVE_IMAGE_PATTERN = re.compile(
+    r"logo|icon|avatar|sprite|badge|emoji|spinner|placeholder|pixel|tracking|gravatar|favicon",
+    re.IGNORECASE
+)
+
+ARTICLE_TYPES = {
+    "Article", "NewsArticle", "BlogPosting", "Report", "ScholarlyArticle",
+    "AnalysisNewsArticle", "OpinionNewsArticle", "ReportageNewsArticle", "WebPage",
+}
+
+
+def parse_html(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html or "", "lxml")
+
+
+def extract_links(crawl_links: Optional[dict]) -> List[str]:
+    """Unique absolute http(s) links from crawl4ai's `result.links`, in page order."""
+    links = []
+    seen = set()
+    for group in ("internal", "external"):
+        for link in (crawl_links or {}).get(group, []):
+            href = urldefrag((link.get("href") or "").strip())[0]
+            if urlparse(href).scheme not in ("http", "https") or href in seen:
+                continue
+            seen.add(href)
+            links.append(href)
+    return links
+
+
+def _meta_content(soup: BeautifulSoup, *names: str) -> Optional[str]:
+    # Look up <meta name=...> or <meta property=...>, in order of preference
+    for name in names:
+        tag = soup.find("meta", attrs={"name": name}) or soup.find("meta", attrs={"property": name})
+        if tag and tag.get("content", "").strip():
+            return tag["content"].strip()
+    return None
+
+
+def _json_ld_objects(soup: BeautifulSoup) -> Iterable[dict]:
+    for script in soup.find_all("script", attrs={"type": "application/ld+json"}):
+        try:
+            data = json.loads(script.string or "")
+        except (json.JSONDecodeError, TypeError):
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            item = stack.pop(0)
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                if "@graph" in item:
+                    stack.extend(item["@graph"] if isinstance(item["@graph"], list) else [item["@graph"]])
+                yield item
+
+
+def _json_ld_article(soup: BeautifulSoup) -> dict:
+    for item in _json_ld_objects(soup):
+        types = item.get("@type")
+        types = types if isinstance(types, list) else [types]
+        if any(t in ARTICLE_TYPES for t in types):
+            return item
+    return {}
+
+
+def _names(value) -> List[str]:
+    # JSON-LD people are a string, an object with "name", or a list of either
+    if isinstance(value, str):
+        return [value.strip()] if value.strip() else []
+    if isinstance(value, dict):
+        return _names(value.get("name"))
+    if isinstance(value, list):
+        return [name for item in value for name in _names(item)]
+    return []
+
+
+def _keywords(value) -> List[str]:
+    if isinstance(value, str):
+        return [keyword.strip() for keyword in value.split(",") if keyword.strip()]
+    if isinstance(value, list):
+        return [keyword for item in value for keyword in _keywords(item)]
+    return []
+
+
+def extract_metadata(soup: BeautifulSoup, url: str) -> dict:
+    """Title, description, author, publish date and keywords from <meta>, OpenGraph and JSON-LD."""
+    article = _json_ld_article(soup)
+
+    title = _meta_content(soup, "og:title", "twitter:title") or article.get("headline")
+    if not title and soup.title and soup.title.string:
+        title = soup.title.string.strip()
+
+    authors = _names(article.get("author"))
+    author = ", ".join(dict.fromkeys(authors)) if authors else _meta_content(soup, "author", "article:author", "byl")
+
+    keywords = _keywords(_meta_content(soup, "keywords", "news_keywords"))
+    keywords += [tag["content"].strip() for tag in soup.find_all("meta", attrs={"property": "article:tag"}) if tag.get("content")]
+    keywords += _keywords(article.get("keywords"))
+
+    return {
+        "url": url,
+        "title": title,
+        "description": _meta_content(soup, "description", "og:description", "twitter:description") or article.get("description"),
+        "author": author,
+        "publish_date": (
+            _meta_content(soup, "article:published_time", "datePublished", "pubdate", "date", "dc.date")
+            or article.get("datePublished")
+        ),
+        "keywords": list(dict.fromkeys(keywords)),
+    }
+
+
+def _parse_srcset(srcset: str) -> List[tuple]:
+    """[(url, width or None), ...] from a srcset attribute."""
+    candidates = []
+    for candidate in srcset.split(","):
+        parts = candidate.strip().split()
+        if not parts:
+            continue
+        width = None
+        if len(parts) > 1 and parts[1].endswith("w") and parts[1][:-1].isdigit():
+            width = int(parts[1][:-1])
+        candidates.append((parts[0], width))
+    return candidates
+
+
+def _sizes_width(sizes: str) -> Optional[int]:
+    """Largest slot width in pixels from a sizes attribute, e.g. '(max-width: 600px) 100vw, 800px'."""
+    widths = []
+    for slot in sizes.split(","):
+        # The slot size is the last token; anything before it is a media condition
+        match = re.search(r"([\d.]+)(px|vw)\s*$", slot.strip())
+        if not match:
+            continue
+        value = float(match.group(1))
+        widths.append(int(value * VIEWPORT_WIDTH / 100) if match.group(2) == "vw" else int(value))
+    return max(widths) if widths else None
+
+
+def _int_attr(value) -> Optional[int]:
+    # Pixels only: a percentage or em width says nothing about the image's size
+    match = re.fullmatch(r"\s*(\d+)\s*(?:px)?\s*", str(value or ""), re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def _in_boilerplate(img) -> bool:
+    return any(parent.name in BOILERPLATE_TAGS for parent in img.parents)
+
+
+def _main_region(soup: BeautifulSoup):
+    # Prefer explicit article markup; fall back to the whole body
+    for selector in ("[itemprop=articleBody]", "article", "main", "[role=main]"):
+        region = soup.select_one(selector)
+        if region is not None:
+            return region
+    return soup.body or soup
+
+
+def extract_image_urls(soup: BeautifulSoup, base_url: str, min_width: int = MIN_IMAGE_WIDTH) -> List[str]:
+    """
+    Candidate main content images, using width/srcset/sizes hints for the minimum width rule.
+
+    Images without any size hint are kept only when they sit in explicit
+    article markup, since there is nothing else to judge them by.
+    """
+    region = _main_region(soup)
+    in_article = region is not soup.body and region is not soup
+
+    image_urls = []
+    seen = set()
+    for img in region.find_all("img"):
+        if _in_boilerplate(img):
+            continue
+
+        src = img.get("src") or img.get("data-src") or img.get("data-lazy-src") or ""
+        srcset = _parse_srcset(img.get("srcset") or img.get("data-srcset") or "")
+        # Take the largest srcset candidate when widths are given
+        sized = [candidate for candidate in srcset if candidate[1]]
+        if sized:
+            src, srcset_width = max(sized, key=lambda candidate: candidate[1])
+        else:
+            srcset_width = None
+            if not src and srcset:
+                src = srcset[-1][0]
+
+        src = src.strip()
+        if not src or src.startswith("data:"):
+            continue
+
+        decoration = " ".join([src, " ".join(img.get("class") or []), img.get("id") or "", img.get("alt") or ""])
+        if DECORATIVE_IMAGE_PATTERN.search(decoration):
+            continue
+
+        hints = [width for width in (_int_attr(img.get("width")), srcset_width, _sizes_width(img.get("sizes") or "")) if width]
+        if hints and max(hints) < min_width:
+            continue
+        if not hints and not in_article:
+            continue
+
+        absolute = urljoin(base_url, src)
+        if urlparse(absolute).scheme not in ("http", "https") or absolute in seen:
+            continue
+        seen.add(absolute)
+        image_urls.append(absolute)
+    return image_urls
@@ -0,0 +1,156 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from bs4 import BeautifulSoup, Tag
+from crawl4ai.config import WORD_TOKEN_RATE
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+
+# Tags that never carry article text
+NOISE_TAGS = ("script", "style", "noscript", "iframe", "nav", "header", "footer", "form", "svg", "button", "select")
+
+# class/id hints for article containers vs. page furniture
+POSITIVE_PATTERN = re.compile(
+    r"article|body|content|entry|main|page|post|story|text|blog",
+    re.IGNORECASE
+)
+NEGATIVE_PATTERN = re.compile(
+    r"comment|cookie|consent|gdpr|related|recommend|more-stories|read-next|promo|sponsor|advert|"
+    r"\bads?\b|\bad[-_]|banner|newsletter|subscribe|signup|share|social|popup|modal|sidebar|widget|"
+    r"outbrain|taboola|paywall|breadcrumb|pagination|tags|byline-share|footer|masthead|menu",
+    re.IGNORECASE
+)
+
+# Block elements that can hold the article
+CANDIDATE_TAGS = ("article", "main", "section", "div", "td")
+
+# Below this much text the "article" is more likely a teaser or a miss
+MIN_ARTICLE_CHARS = 250
+
+
+@dataclass
+class PruneResult:
+    markdown: str
+    # Share of the page's paragraph text that sits inside the selected region (0-1)
+    confidence: float
+    applied: bool
+
+
+def estimate_tokens(text: str) -> int:
+    # Same words-to-tokens estimate crawl4ai uses for chunking
+    return int(len((text or "").split()) * WORD_TOKEN_RATE)
+
+
+def _hints(node: Tag) -> str:
+    return " ".join(node.get("class") or []) + " " + (node.get("id") or "")
+
+
+def _class_weight(node: Tag) -> int:
+    hints = _hints(node)
+    weight = 0
+    if NEGATIVE_PATTERN.search(hints):
+        weight -= 25
+    if POSITIVE_PATTERN.search(hints):
+        weight += 25
+    return weight
+
+
+def _text_length(node: Tag) -> int:
+    return len(node.get_text(" ", strip=True))
+
+
+def _link_density(node: Tag) -> float:
+    text_length = _text_length(node)
+    if not text_length:
+        return 1.0
+    link_length = sum(len(a.get_text(" ", strip=True)) for a in node.find_all("a"))
+    return min(1.0, link_length / text_length)
+
+
+def _paragraph_chars(node: Tag) -> int:
+    return sum(len(p.get_text(" ", strip=True)) for p in node.find_all("p"))
+
+
+def _strip_boilerplate(root: Tag):
+    for tag in root.find_all(NOISE_TAGS):
+        tag.decompose()
+    # Drop furniture blocks (comments, related rails, cookie banners, inline ads)
+    # unless they also look like article containers. A wrapper holding most of
+    # the page's prose (e.g. "layout-with-sidebar") is kept whatever its name.
+    total_chars = _paragraph_chars(root)
+    for node in root.find_all(True):
+        if node.decomposed:
+            continue
+        hints = _hints(node)
+        if not NEGATIVE_PATTERN.search(hints) or POSITIVE_PATTERN.search(hints):
+            continue
+        if _paragraph_chars(node) < total_chars * 0.5:
+            node.decompose()
+
+
+def _best_candidate(root: Tag) -> Optional[Tag]:
+    scores = {}
+    for paragraph in root.find_all(["p", "pre", "blockquote"]):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < 25:
+            continue
+        # Longer, comma-rich paragraphs are prose rather than UI text
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = paragraph.parent
+        grandparent = parent.parent if parent is not None else None
+        for ancestor, share in ((parent, 1.0), (grandparent, 0.5)):
+            if not isinstance(ancestor, Tag) or ancestor.name not in CANDIDATE_TAGS:
+                continue
+            if id(ancestor) not in scores:
+                base = {"article": 10, "main": 10, "section": 3, "div": 5, "td": 3}[ancestor.name]
+                scores[id(ancestor)] = [ancestor, base + _class_weight(ancestor)]
+            scores[id(ancestor)][1] += score * share
+
+    best, best_score = None, 0.0
+    for node, score in scores.values():
+        score *= 1 - _link_density(node)
+        if score > best_score:
+            best, best_score = node, score
+    return best
+
+
+def _expand(best: Tag) -> Tag:
+    # Article bodies are often split across sibling blocks; climb while the parent
+    # adds little except more prose
+    node = best
+    while isinstance(node.parent, Tag) and node.parent.name in CANDIDATE_TAGS:
+        parent = node.parent
+        if _paragraph_chars(parent) > _paragraph_chars(node) * 1.25 and _link_density(parent) < 0.3:
+            node = parent
+        else:
+            break
+    return node
+
+
+def prune_to_main_content(html: str, url: str, full_markdown: str, min_confidence: float = 0.5) -> PruneResult:
+    """
+    Reduce the page to its likely article region before it is sent to the LLM.
+
+    Blocks are scored by paragraph text, link density and class/id hints.
+    When the best region holds less than `min_confidence` of the page's
+    paragraph text, or too little text overall, the full page markdown is kept.
+    """
+    soup = BeautifulSoup(html or "", "lxml")
+    root = soup.body or soup
+    _strip_boilerplate(root)
+
+    total_chars = _paragraph_chars(root)
+    best = _best_candidate(root)
+    if best is None or not total_chars:
+        return PruneResult(markdown=full_markdown, confidence=0.0, applied=False)
+
+    region = _expand(best)
+    region_chars = _paragraph_chars(region)
+    confidence = region_chars / total_chars
+    if confidence < min_confidence or _text_length(region) < MIN_ARTICLE_CHARS:
+        return PruneResult(markdown=full_markdown, confidence=confidence, applied=False)
+
+    markdown = DefaultMarkdownGenerator().generate_markdown(str(region), base_url=url, citations=False).raw_markdown
+    if not markdown.strip():
+        return PruneResult(markdown=full_markdown, confidence=confidence, applied=False)
+    return PruneResult(markdown=markdown, confidence=confidence, applied=True)
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from llm_cache import CacheBackend, MemoryCacheBackend, SQLiteCacheBackend
+from metrics import RECRAWLS
+
+
+def fingerprint(text: str) -> str:
+    """Hash of a page's text that ignores whitespace and line-wrapping differences."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def response_header(result, name: str) -> Optional[str]:
+    # aiohttp keeps the server's header case, Playwright lowercases it
+    name = name.lower()
+    for key, value in (getattr(result, "response_headers", None) or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class RecrawlStore:
+    """
+    What the last successful crawl of a URL returned: its ETag and
+    Last-Modified validators, a fingerprint of the text sent to the LLM, and
+    the response itself, so a re-crawl of an unchanged page can answer from it.
+
+    Entries are keyed on the URL plus the options that shape the response.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+
+    @staticmethod
+    def make_key(url: str, variant: str = "") -> str:
+        return hashlib.sha256(f"{url}\0{variant}".encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        if self.backend.blocking:
+            value = await asyncio.to_thread(self.backend.get, key)
+        else:
+            value = self.backend.get(key)
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, state: Any) -> None:
+        value = json.dumps(state, ensure_ascii=False, default=str)
+        if self.backend.blocking:
+            await asyncio.to_thread(self.backend.set, key, value)
+        else:
+            self.backend.set(key, value)
+
+    def record(self, outcome: str):
+        # not_modified: the server answered 304; unchanged: same fingerprint; changed: extracted again
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        RECRAWLS.labels(outcome=outcome).inc()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "changed": self.changed,
+        }
+
+
+def create_store_from_env() -> Optional[RecrawlStore]:
+    """Build the re-crawl store from RECRAWL_* environment variables, or None if disabled."""
+    backend_name = os.getenv("RECRAWL_BACKEND", "memory").lower()
+    ttl = float(os.getenv("RECRAWL_TTL", "604800")) or None
+    max_entries = int(os.getenv("RECRAWL_MAX_ENTRIES", "1000"))
+
+    if backend_name in ("", "none", "off", "disabled"):
+        return None
+    if backend_name == "memory":
+        backend = MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+    elif backend_name == "sqlite":
+        path = os.getenv("RECRAWL_PATH", os.path.join(".cache", "recrawl.sqlite3"))
+        backend = SQLiteCacheBackend(path, max_entries=max_entries, ttl=ttl)
+    else:
+        raise ValueError(f"Unknown RECRAWL_BACKEND: {backend_name!r} (expected memory, sqlite or none)")
+    return RecrawlStore(backend)
@@ -0,0 +1,120 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from metrics import BLOCKED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Playwright resource types that may be blocked
+BLOCKABLE_RESOURCE_TYPES = ("image", "media", "font", "stylesheet")
+
+# Content is read from the DOM, so the bytes behind these are never needed.
+# Stylesheets are left alone by default: some pages only reveal or lay out lazy content once styled.
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# Ad, analytics and tag-manager hosts; subdomains are blocked too
+TRACKER_DOMAINS = frozenset({
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "googletagservices.com",
+    "googletagmanager.com", "google-analytics.com", "adservice.google.com",
+    "connect.facebook.net", "facebook.net", "ads-twitter.com", "analytics.twitter.com",
+    "amazon-adsystem.com", "adnxs.com", "adsrvr.org", "criteo.com", "criteo.net",
+    "taboola.com", "outbrain.com", "pubmatic.com", "rubiconproject.com", "casalemedia.com",
+    "openx.net", "moatads.com", "scorecardresearch.com", "quantserve.com", "quantcount.com",
+    "chartbeat.com", "chartbeat.net", "hotjar.com", "clarity.ms", "segment.io", "segment.com",
+    "mixpanel.com", "nr-data.net", "optimizely.com", "krxd.net", "bluekai.com", "demdex.net",
+    "omtrdc.net", "tiqcdn.com", "parsely.com", "newrelic.com", "sharethrough.com", "teads.tv",
+    "3lift.com", "bidswitch.net", "yieldmo.com", "media.net", "zemanta.com", "permutive.com",
+})
+
+
+@dataclass(frozen=True)
+class BlockingRules:
+    resource_types: FrozenSet[str]
+    domains: FrozenSet[str]
+
+    def blocks(self, resource_type: str, url: str) -> Optional[str]:
+        """What the request is blocked as (its resource type, or "tracker"), or None to let it through."""
+        if resource_type in self.resource_types:
+            return resource_type
+        if self.domains and domain_blocked(urlparse(url).hostname or "", self.domains):
+            return "tracker"
+        return None
+
+
+def domain_blocked(host: str, domains: FrozenSet[str]) -> bool:
+    host = host.lower().rstrip(".")
+    # Check the host and each parent domain: a.b.example.com, b.example.com, example.com
+    parts = host.split(".")
+    return any(".".join(parts[i:]) in domains for i in range(len(parts) - 1))
+
+
+def make_rules(resource_types: Iterable[str], block_trackers: bool = True, extra_domains: Iterable[str] = ()) -> BlockingRules:
+    domains = set(TRACKER_DOMAINS) if block_trackers else set()
+    domains.update(domain.strip().lower() for domain in extra_domains if domain.strip())
+    return BlockingRules(frozenset(resource_types), frozenset(domains))
+
+
+def parse_resource_types(value: str) -> List[str]:
+    """Resource types from a comma-separated setting; "none" blocks nothing."""
+    if value.strip().lower() == "none":
+        return []
+    resource_types = [name.strip().lower() for name in value.split(",") if name.strip()]
+    unknown = set(resource_types) - set(BLOCKABLE_RESOURCE_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))} (expected {', '.join(BLOCKABLE_RESOURCE_TYPES)})")
+    return resource_types
+
+
+# Rules for the crawl running in the current task; nothing is blocked when unset
+_rules: ContextVar[Optional[BlockingRules]] = ContextVar("blocking_rules", default=None)
+
+
+@contextmanager
+def blocking_rules(rules: Optional[BlockingRules]):
+    """Use `rules` for pages opened by the current task (and tasks it starts)."""
+    token = _rules.set(rules)
+    try:
+        yield
+    finally:
+        _rules.reset(token)
+
+
+async def block_resources(page, context=None, **kwargs):
+    """
+    crawl4ai `on_page_context_created` hook: aborts requests the current rules
+    block before they leave the browser.
+
+    Blocking happens at the network layer, so <img src>/srcset attributes stay in
+    the DOM and image URLs are still extracted; only the bytes are skipped.
+    """
+    rules = _rules.get()
+    # crawl4ai may hand out a page again; the route is installed once and reads the latest rules
+    page._blocking_rules = rules
+    if rules is None or (not rules.resource_types and not rules.domains) or getattr(page, "_blocking_routed", False):
+        return page
+
+    async def handle(route):
+        request = route.request
+        rules = page._blocking_rules
+        # Never block the page itself, even if it lives on a listed domain
+        if rules is None or (request.is_navigation_request() and request.frame == page.main_frame):
+            await route.continue_()
+            return
+        reason = rules.blocks(request.resource_type, request.url)
+        if reason is None:
+            await route.continue_()
+            return
+        BLOCKED_REQUESTS.labels(reason=reason).inc()
+        await route.abort("blockedbyclient")
+
+    try:
+        await page.route("**/*", handle)
+        page._blocking_routed = True
+    except Exception:
+        # A page without blocking is slower, not wrong
+        logger.warning("Could not install request blocking", exc_info=True)
+    return page
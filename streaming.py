@@ -0,0 +1,194 @@
+import json
+from typing import Awaitable, Callable, List, Optional, Union
+
+REPLACEMENT_CHAR = "\ufffd"
+
+# Single-character JSON escapes
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+BLOCKS_TAG = "<blocks>"
+
+
+def sse_event(event: str, data: Union[str, dict]) -> str:
+    """One Server-Sent Event; `data` is a dict or an already serialised JSON string."""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class ContentStreamParser:
+    """
+    Incremental JSON parser for a streamed `<blocks>[{"content": ...}, ...]</blocks>`
+    answer: feed() it the completion as it arrives and it returns the newly
+    decoded text of the blocks' "content" strings, escapes resolved, without
+    waiting for the JSON to be complete.
+
+    It only tracks enough structure to know when a string is the "content" value
+    of a block; anything it does not understand is skipped, since the complete
+    answer is parsed properly once it has arrived.
+    """
+
+    def __init__(self, field: str = "content"):
+        self.field = field
+        self._pending = ""
+        self._started = False
+        self._done = False
+        # "{" and "[" of the containers we are in
+        self._stack: List[str] = []
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._capturing = False
+        self._key_chars: List[str] = []
+        # Escape sequence read so far, e.g. "\\" or "\\u00e"
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._values_seen = 0
+
+    def feed(self, text: str) -> str:
+        if self._done:
+            return ""
+        if not self._started:
+            self._pending += text
+            start = self._find_start(self._pending)
+            if start is None:
+                return ""
+            text, self._pending = self._pending[start:], ""
+            self._started = True
+
+        out: List[str] = []
+        for char in text:
+            self._step(char, out)
+            if self._done:
+                break
+        return "".join(out)
+
+    @staticmethod
+    def _find_start(text: str) -> Optional[int]:
+        tag = text.find(BLOCKS_TAG)
+        if tag >= 0:
+            return tag + len(BLOCKS_TAG)
+        # Some answers are bare JSON without the tags
+        stripped = text.lstrip()
+        if stripped[:1] in ("[", "{"):
+            return len(text) - len(stripped)
+        return None
+
+    def _step(self, char: str, out: List[str]):
+        if self._in_string:
+            if self._escape is not None:
+                self._escape += char
+                decoded = self._decode_escape(self._escape)
+                if decoded is not None:
+                    self._escape = None
+                    self._string_char(decoded, out)
+            elif char == "\\":
+                self._escape = "\\"
+            elif char == '"':
+                self._end_string(out)
+            else:
+                self._string_char(self._lone_surrogate() + char, out)
+            return
+
+        top = self._stack[-1] if self._stack else None
+        if char == '"':
+            self._in_string = True
+            self._string_is_key = top == "{" and self._expect_key
+            if self._string_is_key:
+                self._key_chars = []
+            else:
+                # A block's "content": a key of an object at the top level or directly in the top-level array
+                self._capturing = top == "{" and self._key == self.field and len(self._stack) <= 2
+                if self._capturing and self._values_seen:
+                    out.append("\n\n")
+        elif char in "{[":
+            self._stack.append(char)
+            self._expect_key = char == "{"
+            self._key = None
+        elif char in "}]":
+            if self._stack:
+                self._stack.pop()
+            self._expect_key = False
+            if not self._stack:
+                self._done = True
+        elif char == ",":
+            self._expect_key = top == "{"
+        elif char == ":":
+            self._expect_key = False
+
+    def _string_char(self, text: str, out: List[str]):
+        if not text:
+            return
+        if self._string_is_key:
+            self._key_chars.append(text)
+        elif self._capturing:
+            out.append(text)
+
+    def _lone_surrogate(self) -> str:
+        # A high surrogate escape not followed by a low one stands for nothing valid
+        if self._high_surrogate is None:
+            return ""
+        self._high_surrogate = None
+        return REPLACEMENT_CHAR
+
+    def _end_string(self, out: List[str]):
+        self._string_char(self._lone_surrogate(), out)
+        if self._string_is_key:
+            self._key = "".join(self._key_chars)
+        elif self._capturing:
+            self._values_seen += 1
+        self._in_string = False
+        self._capturing = False
+
+    def _decode_escape(self, sequence: str) -> Optional[str]:
+        """The text an escape sequence stands for, "" for half a surrogate pair, None while incomplete."""
+        kind = sequence[1]
+        if kind != "u":
+            return self._lone_surrogate() + ESCAPES.get(kind, kind)
+        if len(sequence) < 6:
+            return None
+        try:
+            code = int(sequence[2:6], 16)
+        except ValueError:
+            return self._lone_surrogate() + REPLACEMENT_CHAR
+        if 0xD800 <= code < 0xDC00:
+            previous = self._lone_surrogate()
+            self._high_surrogate = code
+            return previous
+        if 0xDC00 <= code < 0xE000:
+            high, self._high_surrogate = self._high_surrogate, None
+            if high is None:
+                return REPLACEMENT_CHAR
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        return self._lone_surrogate() + chr(code)
+
+
+class OrderedChunks:
+    """
+    Passes on text streamed by chunks extracted in parallel, in document order:
+    a chunk's text is held back until every chunk before it has finished.
+    """
+
+    def __init__(self, count: int, emit: Callable[[int, str], Awaitable[None]]):
+        self.emit = emit
+        self._current = 0
+        self._buffers: List[List[str]] = [[] for _ in range(count)]
+        self._finished = [False] * count
+
+    async def write(self, index: int, text: str):
+        if not text:
+            return
+        if index == self._current:
+            await self.emit(index, text)
+        else:
+            self._buffers[index].append(text)
+
+    async def finish(self, index: int):
+        self._finished[index] = True
+        while self._current < len(self._finished) and self._finished[self._current]:
+            self._current += 1
+            if self._current < len(self._buffers) and self._buffers[self._current]:
+                text = "".join(self._buffers[self._current])
+                self._buffers[self._current] = []
+                await self.emit(self._current, text)
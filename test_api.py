@@ -139,6 +139,151 @@ def test_missing_api_key():
     
     print()
 
+def auth_headers():
+    return {"Authorization": f"Bearer {DEEPSEEK_API_KEY}"}
+
+def test_extract_batch():
+    """Test the batch extraction endpoint"""
+    print("🔍 Testing batch extraction endpoint...")
+    
+    payload = {
+        "urls": [TEST_URL, "https://example.com/"],
+        "fields": "content,metadata"
+    }
+    
+    try:
+        response = requests.post(
+            f"{API_BASE_URL}/extract/batch",
+            json=payload,
+            headers=auth_headers(),
+            stream=True,
+            timeout=120
+        )
+        
+        if response.status_code == 200:
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+            succeeded = sum(1 for line in lines if line.get("success"))
+            print(f"✅ Batch returned {len(lines)} lines, {succeeded} successful")
+            for line in lines:
+                print(f"   - {(line.get('metadata') or {}).get('url')}: {line.get('error_message') or 'ok'}")
+        else:
+            print(f"❌ Batch request failed with status {response.status_code}")
+            print(f"   Response: {response.text}")
+            
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Request failed: {e}")
+    
+    print()
+
+def test_jobs():
+    """Test submitting and polling a background job"""
+    print("🔍 Testing background jobs...")
+    
+    try:
+        response = requests.post(
+            f"{API_BASE_URL}/jobs",
+            json={"url": TEST_URL},
+            headers=auth_headers(),
+            timeout=10
+        )
+        if response.status_code != 202:
+            print(f"❌ Job submission failed with status {response.status_code}")
+            print(f"   Response: {response.text}")
+            print()
+            return
+        
+        job_id = response.json()["job_id"]
+        print(f"   Submitted job {job_id}")
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            job = requests.get(f"{API_BASE_URL}/jobs/{job_id}", headers=auth_headers(), timeout=10).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(2)
+        
+        if job["status"] == "completed":
+            print("✅ Job completed")
+            print(f"   Content length: {len((job.get('result') or {}).get('content') or '')} characters")
+        else:
+            print(f"❌ Job ended as {job['status']}: {job.get('error_message')}")
+            
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Request failed: {e}")
+    
+    print()
+
+def test_metrics():
+    """Test the Prometheus metrics endpoint"""
+    print("🔍 Testing metrics endpoint...")
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}/metrics", timeout=5)
+        if response.status_code == 200 and "crawl4ai_stage_seconds" in response.text:
+            print("✅ Metrics exposed")
+            print(f"   {len(response.text.splitlines())} lines")
+        else:
+            print(f"❌ Metrics check failed with status {response.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Metrics check failed: {e}")
+    
+    print()
+
+def test_ready():
+    """Test the readiness endpoint"""
+    print("🔍 Testing readiness endpoint...")
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}/ready", timeout=5)
+        if response.status_code == 200 and response.json().get("status") == "ready":
+            print("✅ Service is ready")
+        elif response.status_code == 503:
+            print(f"⏳ Service is still warming up: {response.json()}")
+        else:
+            print(f"❌ Readiness check failed with status {response.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Readiness check failed: {e}")
+    
+    print()
+
+def test_extract_stream():
+    """Test the Server-Sent Events extraction endpoint"""
+    print("🔍 Testing streaming extraction endpoint...")
+    
+    try:
+        start_time = time.time()
+        response = requests.post(
+            f"{API_BASE_URL}/extract/stream",
+            json={"url": TEST_URL},
+            headers=auth_headers(),
+            stream=True,
+            timeout=120
+        )
+        
+        if response.status_code != 200:
+            print(f"❌ Stream request failed with status {response.status_code}")
+            print(f"   Response: {response.text}")
+            print()
+            return
+        
+        events = []
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+                if not events:
+                    print(f"   First event ({event}) after {time.time() - start_time:.2f}s")
+                events.append(event)
+        
+        if events and events[-1] == "result":
+            print(f"✅ Stream finished after {time.time() - start_time:.2f}s")
+            print(f"   Events: {', '.join(sorted(set(events), key=events.index))}")
+        else:
+            print(f"❌ Stream ended without a result: {events[-1:] or 'no events'}")
+            
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Request failed: {e}")
+    
+    print()
+
 def main():
     print("🚀 Starting API tests...")
     print(f"API Base URL: {API_BASE_URL}")
@@ -146,9 +291,14 @@ def main():
     
     # Run tests
     test_health_check()
+    test_ready()
+    test_metrics()
     test_extract_content()
     test_invalid_url()
     test_missing_api_key()
+    test_extract_batch()
+    test_jobs()
+    test_extract_stream()
     
     print("✅ All tests completed!")
 
@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from compression import CompressionMiddleware, negotiate
+
+ALL = ("zstd", "br", "gzip")
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", "br"),               # equal q: server preference order decides
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0.8, br;q=0.8, zstd;q=0.8", "zstd"),
+    ("br;q=0, gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+    ("*", "zstd"),
+    ("*;q=0.1, gzip;q=0.5", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip;q=oops, br", "br"),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header, ALL) == expected
+
+
+def test_negotiate_only_offers_supported_encodings():
+    assert negotiate("zstd, br", ("gzip",)) is None
+    assert negotiate("zstd, gzip;q=0.1", ("br", "gzip")) == "gzip"
+
+
+def run_app(messages, accept_encoding="gzip", content_type=b"application/json", extra_headers=(), minimum_size=100,
+            encodings=("gzip",)):
+    """The messages the middleware sends for an app sending `messages` as body chunks."""
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type), *extra_headers]})
+        for index, body in enumerate(messages):
+            await send({"type": "http.response.body", "body": body, "more_body": index < len(messages) - 1})
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = CompressionMiddleware(app, minimum_size=minimum_size, encodings=encodings)
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(middleware(scope, None, send))
+    return dict(sent[0]["headers"]), [message.get("body", b"") for message in sent[1:]]
+
+
+def test_small_body_is_sent_as_is():
+    headers, bodies = run_app([b'{"a": 1}'])
+    assert b"content-encoding" not in headers
+    assert bodies == [b'{"a": 1}']
+
+
+def test_large_body_is_compressed_with_length():
+    body = b'{"text": "' + b"x" * 5000 + b'"}'
+    headers, bodies = run_app([body])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(bodies[0])
+    assert gzip.decompress(bodies[0]) == body
+
+
+def test_stream_chunks_are_flushed_one_by_one():
+    lines = [b'{"n": %d}\n' % n for n in range(3)]
+    headers, bodies = run_app(lines, content_type=b"application/x-ndjson")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    decoder = zlib.decompressobj(31)
+    # Each line can be decoded as soon as its chunk arrives
+    assert [decoder.decompress(body) for body in bodies] == lines
+
+
+def test_stream_avoids_brotli():
+    pytest.importorskip("brotli")
+    headers, _ = run_app([b"event: a\n\n", b"event: b\n\n"], accept_encoding="br, gzip;q=0.5",
+                         content_type=b"text/event-stream", encodings=("br", "gzip"))
+    assert headers[b"content-encoding"] == b"gzip"
+
+
+def test_one_shot_body_may_use_brotli():
+    brotli = pytest.importorskip("brotli")
+    body = b"<p>" + b"hello " * 1000 + b"</p>"
+    headers, bodies = run_app([body], accept_encoding="br, gzip", content_type=b"text/html", encodings=("br", "gzip"))
+    assert headers[b"content-encoding"] == b"br"
+    assert brotli.decompress(bodies[0]) == body
+
+
+def test_stream_without_a_stream_encoding_is_sent_as_is():
+    pytest.importorskip("brotli")
+    headers, bodies = run_app([b"a", b"b"], accept_encoding="br", encodings=("br", "gzip"))
+    assert b"content-encoding" not in headers
+    assert bodies == [b"a", b"b"]
+
+
+@pytest.mark.parametrize("content_type, extra_headers", [
+    (b"image/png", ()),
+    (b"application/json", ((b"content-encoding", b"br"),)),
+])
+def test_uncompressible_responses_pass_through(content_type, extra_headers):
+    body = b"x" * 5000
+    headers, bodies = run_app([body], content_type=content_type, extra_headers=extra_headers)
+    assert headers.get(b"content-encoding") in (None, b"br")
+    assert bodies == [body]
+
+
+def test_existing_vary_is_extended():
+    headers, _ = run_app([b"x" * 5000], extra_headers=((b"vary", b"Origin"),))
+    assert headers[b"vary"] == b"Origin, Accept-Encoding"
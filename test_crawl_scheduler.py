@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from crawl_scheduler import CrawlScheduler
+
+
+async def crawl(scheduler, key, host, started, hold=0.0):
+    async with scheduler.slot(key, host):
+        started.append((key, host, time.monotonic()))
+        await asyncio.sleep(hold)
+
+
+async def queued_behind_blocker(scheduler, crawls):
+    # Hold the only slot while every crawl is queued, so the order they start in is the scheduler's choice alone
+    started = []
+    release = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("blocker", "blocker.example"):
+            await release.wait()
+
+    blocking = asyncio.create_task(blocker())
+    await asyncio.sleep(0)
+    tasks = []
+    for key, host in crawls:
+        tasks.append(asyncio.create_task(crawl(scheduler, key, host, started)))
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocking, *tasks)
+    return [(key, host) for key, host, _ in started]
+
+
+def test_keys_take_turns():
+    scheduler = CrawlScheduler(max_concurrent=1, host_limit=10, host_min_delay=0)
+    order = asyncio.run(queued_behind_blocker(scheduler, [
+        ("a", "one.example"), ("a", "two.example"), ("a", "three.example"), ("b", "four.example")
+    ]))
+    assert [key for key, _ in order] == ["a", "b", "a", "a"]
+    # Within a key, submission order
+    assert [host for key, host in order if key == "a"] == ["one.example", "two.example", "three.example"]
+
+
+def test_busy_host_does_not_hold_up_other_hosts():
+    async def run():
+        scheduler = CrawlScheduler(max_concurrent=4, host_limit=1, host_min_delay=0)
+        started = []
+        first = asyncio.create_task(crawl(scheduler, "a", "busy.example", started, hold=0.2))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(crawl(scheduler, "a", "busy.example", started))
+        third = asyncio.create_task(crawl(scheduler, "a", "free.example", started))
+        await asyncio.gather(first, second, third)
+        return [host for _, host, _ in started]
+
+    assert asyncio.run(run()) == ["busy.example", "free.example", "busy.example"]
+
+
+def test_host_min_delay_spaces_starts():
+    async def run():
+        scheduler = CrawlScheduler(max_concurrent=4, host_limit=4, host_min_delay=0.2)
+        started = []
+        await asyncio.gather(
+            crawl(scheduler, "a", "slow.example", started),
+            crawl(scheduler, "b", "slow.example", started),
+            crawl(scheduler, "c", "other.example", started),
+        )
+        return {(key, host): at for key, host, at in started}
+
+    starts = asyncio.run(run())
+    assert starts[("b", "slow.example")] - starts[("a", "slow.example")] >= 0.19
+    # Another host is not delayed
+    assert starts[("c", "other.example")] - starts[("a", "slow.example")] < 0.1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        scheduler = CrawlScheduler(max_concurrent=1, host_limit=1, host_min_delay=0)
+        started = []
+        holder = asyncio.create_task(crawl(scheduler, "a", "one.example", started, hold=0.1))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(crawl(scheduler, "b", "two.example", started))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["queued"] == 1
+        waiter.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["queued"] == 0
+    assert stats["active"] == 0
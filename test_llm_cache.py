@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import llm_cache
+from llm_cache import ExtractionCache, MemoryCacheBackend, SQLiteCacheBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    backends = []
+
+    def make(**options):
+        if request.param == "memory":
+            backend = MemoryCacheBackend(**options)
+        else:
+            backend = SQLiteCacheBackend(str(tmp_path / f"cache-{len(backends)}.sqlite3"), **options)
+        backends.append(backend)
+        return backend
+
+    yield make
+    for backend in backends:
+        if isinstance(backend, SQLiteCacheBackend):
+            backend.close()
+
+
+def test_entry_expires_after_ttl(make_backend, clock):
+    backend = make_backend(ttl=60)
+    backend.set("a", "1")
+    clock.now += 60
+    assert backend.get("a") == "1"
+    clock.now += 1
+    assert backend.get("a") is None
+    # An expired entry is dropped, not just hidden
+    assert len(backend) == 0
+
+
+def test_reads_do_not_extend_ttl(make_backend, clock):
+    backend = make_backend(ttl=60)
+    backend.set("a", "1")
+    clock.now += 50
+    assert backend.get("a") == "1"
+    clock.now += 20
+    assert backend.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted(make_backend, clock):
+    backend = make_backend(max_entries=2)
+    backend.set("a", "1")
+    clock.now += 1
+    backend.set("b", "2")
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used
+    assert backend.get("a") == "1"
+    clock.now += 1
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+    assert backend.get("c") == "3"
+    assert len(backend) == 2
+
+
+def test_overwriting_refreshes_an_entry(make_backend, clock):
+    backend = make_backend(max_entries=2, ttl=60)
+    backend.set("a", "1")
+    clock.now += 50
+    backend.set("a", "2")
+    clock.now += 50
+    assert backend.get("a") == "2"
+    assert len(backend) == 1
+
+
+def test_sqlite_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path)
+    backend.set("a", "1")
+    backend.close()
+    backend = SQLiteCacheBackend(path)
+    assert backend.get("a") == "1"
+    backend.close()
+
+
+def test_make_key_covers_every_part():
+    key = ExtractionCache.make_key("page", {"type": "object"}, "extract", "deepseek")
+    assert key == ExtractionCache.make_key("page", {"type": "object"}, "extract", "deepseek")
+    assert key != ExtractionCache.make_key("page", {"type": "object"}, "extract", "deepseek", "chunked")
+    assert key != ExtractionCache.make_key("page!", {"type": "object"}, "extract", "deepseek")
+    # Parts are separated, so moving text from one part to the next changes the key
+    assert ExtractionCache.make_key("b", {}, "a", "p") != ExtractionCache.make_key("", {}, "ab", "p")
+
+
+def test_extraction_cache_counts_hits_and_returns_copies(make_backend):
+    cache = ExtractionCache(make_backend())
+
+    async def run():
+        assert await cache.get("k") is None
+        await cache.set("k", [{"content": "text"}])
+        first = await cache.get("k")
+        first[0]["content"] = "changed"
+        return await cache.get("k")
+
+    assert asyncio.run(run()) == [{"content": "text"}]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
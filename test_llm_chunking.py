@@ -0,0 +1,81 @@
+import pytest
+
+from llm_chunking import merge_blocks, merge_content, split_markdown
+from pruning import estimate_tokens
+
+
+def paragraph(n: int, words: int = 60) -> str:
+    return f"Paragraph {n} " + " ".join(f"w{n}x{i}" for i in range(words))
+
+
+def test_short_markdown_is_one_chunk():
+    assert split_markdown("# Title\n\nShort text.", 2048, 200) == ["# Title\n\nShort text."]
+
+
+def test_chunks_respect_size_and_overlap():
+    markdown = "\n\n".join(paragraph(n) for n in range(40))
+    chunks = split_markdown(markdown, 500, 100)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 500 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # Each chunk starts with the last paragraph of the one before
+        assert chunk.split("\n\n")[0] == previous.split("\n\n")[-1]
+
+
+def test_heading_starts_a_new_chunk_once_half_full():
+    markdown = "\n\n".join([paragraph(0, 150), paragraph(1, 150), "## Section two", paragraph(2, 300)])
+    chunks = split_markdown(markdown, 600, 0)
+    assert [chunk.split("\n\n")[0] for chunk in chunks] == [paragraph(0, 150), "## Section two"]
+
+
+@pytest.mark.parametrize("markdown", [
+    " ".join(f"word{i}" for i in range(10000)),
+    " ".join(f"Sentence number {i} is here." for i in range(3000)),
+    "\n".join(f"Update {i}: the live blog goes on" for i in range(3000)),
+])
+def test_oversized_paragraph_is_split_and_merged_back(markdown):
+    chunks = split_markdown(markdown, 2048, 200)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 2048 for chunk in chunks)
+    # With the model echoing each chunk, merging restores the page exactly
+    assert merge_content(chunks) == markdown
+
+
+def test_sentences_are_not_cut():
+    markdown = " ".join(f"Sentence number {i} is here." for i in range(3000))
+    for chunk in split_markdown(markdown, 2048, 200):
+        assert chunk.startswith("Sentence") and chunk.endswith(".")
+
+
+def test_merge_drops_repeated_overlap_paragraphs():
+    parts = ["# Title\n\nFirst.\n\nSecond.", "Second.\n\nThird.", "third.\n\nFourth."]
+    assert merge_content(parts) == "# Title\n\nFirst.\n\nSecond.\n\nThird.\n\nFourth."
+
+
+def test_merge_keeps_paragraphs_repeated_further_back():
+    # Only the end of the previous output can be overlap; a genuinely repeated line elsewhere stays
+    parts = ["Subscribe now.\n\nA.\n\nB.\n\nC.", "Subscribe now.\n\nD."]
+    assert merge_content(parts) == "Subscribe now.\n\nA.\n\nB.\n\nC.\n\nSubscribe now.\n\nD."
+
+
+def test_merge_ignores_short_accidental_word_overlap():
+    parts = ["It was the end of the day.", "the day. A new story begins."]
+    assert merge_content(parts) == "It was the end of the day.\n\nthe day. A new story begins."
+
+
+def test_single_part_is_returned_verbatim():
+    content = "Intro\n# Heading right after\n\n\n\nSpaced out"
+    assert merge_content([content]) == content
+
+
+def test_merge_blocks_combines_chunks_in_order():
+    blocks = [
+        {"content": "A.\n\nB.", "main_content_image_urls": ["1.jpg"], "metadata": {"title": "", "author": "X"}},
+        {"index": 1, "error": True, "content": "timeout"},
+        {"content": "B.\n\nC.", "main_content_image_urls": ["1.jpg", "2.jpg"], "metadata": {"title": "T"}},
+    ]
+    assert merge_blocks(blocks) == {
+        "content": "A.\n\nB.\n\nC.",
+        "main_content_image_urls": ["1.jpg", "2.jpg"],
+        "metadata": {"author": "X", "title": "T"},
+    }
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from llm_client import AdaptiveLimiter, LLMClient, LLMError, MIN_HEDGE_SAMPLES, parse_retry_after
+
+
+def completion(content: str) -> dict:
+    return {"choices": [{"message": {"content": content}}], "usage": {"prompt_tokens": 10, "completion_tokens": 2}}
+
+
+def run_client(handler, setup=None, **options):
+    """Result of one complete() call against `handler`, plus the client for inspection."""
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = LLMClient(http, "key", "model", "http://llm.test", backoff_base=0.01, **options)
+            if setup is not None:
+                setup(client)
+            return await client.complete("hi"), client
+
+    return asyncio.run(run())
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_limiter_halves_on_overload_once_per_cooldown():
+    limiter = AdaptiveLimiter(8, cooldown=60)
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 4
+
+
+def test_limiter_never_drops_below_minimum_and_grows_back():
+    limiter = AdaptiveLimiter(4, cooldown=0)
+    for _ in range(5):
+        limiter.on_overload()
+    assert limiter.limit == 1
+
+    async def succeed(times):
+        for _ in range(times):
+            await limiter.on_success()
+
+    asyncio.run(succeed(10))
+    assert 4 >= limiter.limit > 3
+
+
+def test_limiter_caps_concurrency():
+    limiter = AdaptiveLimiter(2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+def test_retries_retryable_status_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, json=completion("ok"))
+
+    (content, usage), client = run_client(handler, max_retries=3)
+    assert content == "ok"
+    assert usage["prompt_tokens"] == 10
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "0"}, text="slow down")
+
+    with pytest.raises(LLMError) as error:
+        run_client(handler, max_retries=2)
+    assert error.value.status == 429
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(401, text="bad key")
+
+    with pytest.raises(LLMError) as error:
+        run_client(handler, max_retries=3)
+    assert error.value.status == 401
+    assert len(calls) == 1
+
+
+def test_overload_lowers_the_key_limit():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=completion("ok"))
+
+    _, client = run_client(handler, max_concurrency=8)
+    assert client.limiter.limit < 8
+
+
+def test_slow_call_is_hedged():
+    calls = []
+
+    async def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            await asyncio.sleep(2)
+            return httpx.Response(200, json=completion("primary"))
+        return httpx.Response(200, json=completion("hedge"))
+
+    def fast_history(client):
+        client._latencies.extend([0.05] * MIN_HEDGE_SAMPLES)
+
+    start = time.monotonic()
+    (content, _), client = run_client(handler, hedge=True, setup=fast_history)
+    assert content == "hedge"
+    assert time.monotonic() - start < 1
+    assert len(calls) == 2
+    # The hedge's extra slot is given back
+    assert client.limiter.in_flight == 0
+
+
+def test_no_hedge_without_latency_history():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=completion("only"))
+
+    (content, _), _ = run_client(handler, hedge=True)
+    assert content == "only"
+    assert len(calls) == 1
+
+
+def sse(*chunks: dict, done: bool = True) -> bytes:
+    lines = [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks]
+    if done:
+        lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode()
+
+
+def delta(text: str) -> dict:
+    return {"choices": [{"delta": {"content": text}}]}
+
+
+def test_streamed_completion_forwards_deltas():
+    received = []
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=sse(delta("Hel"), delta("lo"), {"choices": [], "usage": {"completion_tokens": 2}}))
+
+    async def on_delta(text):
+        received.append(text)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = LLMClient(http, "key", "model", "http://llm.test")
+            return await client.complete("hi", on_delta=on_delta)
+
+    content, usage = asyncio.run(run())
+    assert content == "Hello"
+    assert received == ["Hel", "lo"]
+    assert usage == {"completion_tokens": 2}
+
+
+def test_stream_is_not_retried_after_text_was_delivered():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, content=sse(delta("partial"), done=False) + b"data: {broken\n\n")
+
+    async def on_delta(text):
+        pass
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = LLMClient(http, "key", "model", "http://llm.test", max_retries=3, backoff_base=0.01)
+            return await client.complete("hi", on_delta=on_delta)
+
+    with pytest.raises(LLMError):
+        asyncio.run(run())
+    assert len(calls) == 1
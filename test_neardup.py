@@ -0,0 +1,163 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from llm_cache import ExtractionCache, MemoryCacheBackend, SQLiteCacheBackend
+from neardup import SNAPSHOT_VERSION, NearDuplicateIndex, simhash
+
+BLOCKS = [{"content": "The story", "metadata": {"url": "https://a.example/story"}}]
+
+
+def story(seed: int, words: int = 300) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "omega", "sigma", "kappa", "zeta", "theta", "iota"])
+                    + str(rng.randrange(50)) for _ in range(words))
+
+
+def make_index(tmp_path=None, **options) -> NearDuplicateIndex:
+    cache = ExtractionCache(MemoryCacheBackend())
+    if tmp_path is not None:
+        options.setdefault("snapshot_path", str(tmp_path / "neardup.json"))
+    return NearDuplicateIndex(cache, **options)
+
+
+def add(index, text, url, cache_key, variant="", blocks=BLOCKS):
+    asyncio.run(index.cache.set(cache_key, blocks))
+    value = index.fingerprint(text)
+    index.add(value, url, cache_key, variant)
+    return value
+
+
+def test_simhash_ignores_case_urls_and_short_texts():
+    text = story(1)
+    assert simhash(text) == simhash(text.upper())
+    # Copies on different sites link differently
+    assert simhash(text + " https://a.example/x") == simhash(text + " https://b.example/y?ref=1")
+    assert simhash("too few words here", min_words=50) is None
+
+
+def test_simhash_distance_tracks_similarity():
+    # A newsletter-length text with its sign-off changed is a near-duplicate; another text of the same words is not
+    text = story(1, words=1000)
+    edited = " ".join(text.split()[:-2] + ["changed", "ending"])
+    assert (simhash(text) ^ simhash(edited)).bit_count() <= 3
+    assert (simhash(text) ^ simhash(story(2, words=1000))).bit_count() > 16
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 7])
+def test_bands_cover_all_bits(max_distance):
+    index = make_index(max_distance=max_distance)
+    assert len(index._bands) == max_distance + 1
+    assert sum(width for _, width in index._bands) == 64
+    assert all(offset == sum(width for _, width in index._bands[:i]) for i, (offset, _) in enumerate(index._bands))
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 3, 5])
+def test_every_fingerprint_within_max_distance_is_found(max_distance):
+    # Pigeonhole: flipping max_distance bits anywhere leaves at least one band intact
+    index = make_index(max_distance=max_distance)
+    value = add(index, story(1), "https://a.example/story", "key-a")
+    rng = random.Random(max_distance)
+    for _ in range(50):
+        flipped = value
+        for bit in rng.sample(range(64), max_distance):
+            flipped ^= 1 << bit
+        match = asyncio.run(index.find(flipped, "https://b.example/copy"))
+        assert match is not None and match.distance == max_distance
+
+
+def test_fingerprint_beyond_max_distance_is_not_found():
+    index = make_index(max_distance=3)
+    value = add(index, story(1), "https://a.example/story", "key-a")
+    assert asyncio.run(index.find(value ^ 0b1111, "https://b.example/copy")) is None
+
+
+def test_find_returns_the_closest_match_and_counts_reuse():
+    index = make_index(max_distance=3)
+    value = add(index, story(1), "https://a.example/story", "key-a")
+    index.add(value ^ 0b1, "https://c.example/close", "key-c")
+    asyncio.run(index.cache.set("key-c", [{"content": "close"}]))
+    match = asyncio.run(index.find(value ^ 0b11, "https://b.example/copy"))
+    assert (match.url, match.distance, match.blocks) == ("https://c.example/close", 1, [{"content": "close"}])
+    assert index.stats()["reused"] == 1
+    # Index lookups don't count as cache hits
+    assert index.cache.hits == 0
+
+
+def test_same_url_and_other_variants_are_skipped():
+    index = make_index()
+    value = add(index, story(1), "https://a.example/story", "key-a", variant="content")
+    assert asyncio.run(index.find(value, "https://a.example/story", "content")) is None
+    assert asyncio.run(index.find(value, "https://b.example/copy", "content,links")) is None
+    assert asyncio.run(index.find(value, "https://b.example/copy", "content")) is not None
+
+
+def test_entry_whose_extraction_left_the_cache_is_dropped():
+    index = make_index()
+    value = add(index, story(1), "https://a.example/story", "key-a")
+    index.cache.backend.clear()
+    assert asyncio.run(index.find(value, "https://b.example/copy")) is None
+    assert index.stats()["entries"] == 0
+    assert all(not table for table in index._tables)
+
+
+def test_least_recently_used_entries_are_evicted():
+    index = make_index(max_entries=2)
+    first = add(index, story(1), "https://a.example/1", "key-1")
+    add(index, story(2), "https://a.example/2", "key-2")
+    # Reusing the first makes the second the least recently used
+    assert asyncio.run(index.find(first, "https://b.example/1")) is not None
+    third = add(index, story(3), "https://a.example/3", "key-3")
+    assert asyncio.run(index.find(index.fingerprint(story(2)), "https://b.example/2")) is None
+    assert asyncio.run(index.find(first, "https://b.example/1")) is not None
+    assert asyncio.run(index.find(third, "https://b.example/3")) is not None
+    assert index.stats()["entries"] == 2
+
+
+def test_readding_a_url_replaces_its_fingerprint():
+    index = make_index()
+    old = add(index, story(1), "https://a.example/story", "key-old")
+    new = add(index, story(2), "https://a.example/story", "key-new")
+    assert index.stats()["entries"] == 1
+    assert asyncio.run(index.find(old, "https://b.example/copy")) is None
+    assert asyncio.run(index.find(new, "https://b.example/copy")) is not None
+
+
+def test_entry_evicted_during_a_cache_read_is_still_reused(tmp_path):
+    # The sqlite backend is read in a worker thread, so other requests run meanwhile
+    cache = ExtractionCache(SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")))
+    index = NearDuplicateIndex(cache, max_entries=1)
+    value = add(index, story(1), "https://a.example/story", "key-a")
+
+    async def run():
+        lookup = asyncio.create_task(index.find(value, "https://b.example/copy"))
+        await asyncio.sleep(0)
+        index.add(value ^ (1 << 40), "https://c.example/other", "key-c")
+        return await lookup
+
+    match = asyncio.run(run())
+    assert match is not None and match.url == "https://a.example/story"
+    cache.backend.close()
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = make_index(tmp_path)
+    value = add(index, story(1), "https://a.example/story", "key-a", variant="content")
+    index.save()
+
+    restored = NearDuplicateIndex(index.cache, snapshot_path=index.snapshot_path)
+    restored.load()
+    assert restored.stats()["entries"] == 1
+    match = asyncio.run(restored.find(value, "https://b.example/copy", "content"))
+    assert match.url == "https://a.example/story"
+
+
+@pytest.mark.parametrize("content", ["not json", json.dumps({"version": SNAPSHOT_VERSION - 1, "entries": [["k", "ff"]]})])
+def test_unreadable_or_old_snapshot_starts_empty(tmp_path, content):
+    index = make_index(tmp_path)
+    with open(index.snapshot_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    index.load()
+    assert index.stats()["entries"] == 0
@@ -0,0 +1,59 @@
+from pruning import prune_to_main_content
+
+FULL_MARKDOWN = "full page markdown"
+
+PARAGRAPH = (
+    "<p>The council approved the new budget on Tuesday, after a long debate, with funding for schools, "
+    "roads and the library, and a promise to revisit the plan in spring.</p>"
+)
+
+
+def page(body: str) -> str:
+    return f"<html><body>{body}</body></html>"
+
+
+def test_article_is_kept_and_furniture_dropped():
+    html = page(
+        "<nav><a href='/'>Home</a> <a href='/news'>News</a></nav>"
+        f"<article class='story'><h1>Budget passes</h1>{PARAGRAPH * 6}</article>"
+        "<div class='related-stories'><p>You may also like this other story about something else entirely.</p></div>"
+        "<div class='cookie-banner'><p>We use cookies to improve your experience on this website, accept them.</p></div>"
+        "<footer><p>Copyright 2024 The Daily Example, all rights reserved.</p></footer>"
+    )
+    result = prune_to_main_content(html, "https://example.com/a", FULL_MARKDOWN)
+    assert result.applied
+    assert result.confidence == 1.0
+    assert "Budget passes" in result.markdown
+    assert "council approved" in result.markdown
+    for furniture in ("Home", "also like", "cookies", "Copyright"):
+        assert furniture not in result.markdown
+
+
+def test_split_article_body_is_expanded_to_the_common_parent():
+    html = page(f"<div class='post'><div>{PARAGRAPH * 3}</div><div>{PARAGRAPH * 3}</div></div>")
+    result = prune_to_main_content(html, "https://example.com/a", FULL_MARKDOWN)
+    assert result.applied
+    assert result.markdown.count("council approved") == 6
+
+
+def test_low_confidence_falls_back_to_full_markdown():
+    # Prose spread evenly over unrelated blocks: no region holds most of it
+    html = page("".join(f"<section><div>{PARAGRAPH}</div></section><aside>{PARAGRAPH}</aside>" for _ in range(3)))
+    result = prune_to_main_content(html, "https://example.com/a", FULL_MARKDOWN)
+    assert not result.applied
+    assert result.markdown == FULL_MARKDOWN
+    assert result.confidence < 0.5
+
+
+def test_short_region_falls_back_to_full_markdown():
+    result = prune_to_main_content(page(f"<article>{PARAGRAPH}</article>"), "https://example.com/a", FULL_MARKDOWN)
+    assert not result.applied
+    assert result.markdown == FULL_MARKDOWN
+
+
+def test_page_without_paragraphs_falls_back_to_full_markdown():
+    for html in ("", page("<div>Just a heading</div><ul><li>one</li><li>two</li></ul>")):
+        result = prune_to_main_content(html, "https://example.com/a", FULL_MARKDOWN)
+        assert result.markdown == FULL_MARKDOWN
+        assert result.confidence == 0.0
+        assert not result.applied
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from crawl4ai import CacheMode, CrawlerRunConfig
+
+from http_fetch import HttpFetcher
+from llm_cache import MemoryCacheBackend, SQLiteCacheBackend
+from recrawl import RecrawlStore, fingerprint, response_header
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+PAGE = ("<html><body><article>" + "<p>The story of the day, told at some length.</p>" * 20 + "</article></body></html>").encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Validator headers of every request the server received
+    received = []
+
+    def do_GET(self):
+        Handler.received.append((self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+        if self.headers.get("If-None-Match") == ETAG or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/article"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url, etag, last_modified):
+    async def run():
+        fetcher = HttpFetcher()
+        await fetcher.start()
+        try:
+            result = await fetcher.fetch_if_modified(url, CrawlerRunConfig(cache_mode=CacheMode.BYPASS), etag, last_modified)
+            return result, fetcher.stats()
+        finally:
+            await fetcher.close()
+
+    Handler.received.clear()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("etag, last_modified", [(ETAG, None), (None, LAST_MODIFIED), (ETAG, LAST_MODIFIED)])
+def test_not_modified_returns_none(server_url, etag, last_modified):
+    result, stats = fetch(server_url, etag, last_modified)
+    assert result is None
+    assert stats["not_modified"] == 1
+    assert Handler.received == [(etag, last_modified)]
+
+
+def test_modified_page_is_returned_with_new_validators(server_url):
+    result, stats = fetch(server_url, '"v0"', None)
+    assert result.success
+    assert stats["not_modified"] == 0
+    assert response_header(result, "etag") == ETAG
+    assert response_header(result, "Last-Modified") == LAST_MODIFIED
+
+
+def test_validators_are_only_sent_for_conditional_fetches(server_url):
+    async def run():
+        fetcher = HttpFetcher()
+        await fetcher.start()
+        try:
+            await fetcher.fetch_if_modified(server_url, CrawlerRunConfig(cache_mode=CacheMode.BYPASS), ETAG, None)
+            return await fetcher.arun(server_url, CrawlerRunConfig(cache_mode=CacheMode.BYPASS))
+        finally:
+            await fetcher.close()
+
+    Handler.received.clear()
+    result = asyncio.run(run())
+    assert result.success
+    assert Handler.received == [(ETAG, None), (None, None)]
+
+
+def test_fingerprint_ignores_whitespace():
+    assert fingerprint("Hello  world\n\nagain") == fingerprint(" Hello world again ")
+    assert fingerprint("Hello world") != fingerprint("Hello world!")
+
+
+def test_response_header_is_case_insensitive():
+    class Result:
+        response_headers = {"ETag": ETAG}
+
+    assert response_header(Result(), "etag") == ETAG
+    assert response_header(Result(), "last-modified") is None
+    assert response_header(object(), "etag") is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_round_trip_and_keys(backend, tmp_path):
+    if backend == "memory":
+        store = RecrawlStore(MemoryCacheBackend())
+    else:
+        store = RecrawlStore(SQLiteCacheBackend(str(tmp_path / "recrawl.sqlite3")))
+    key = RecrawlStore.make_key("https://example.com/a", "fields=content")
+    assert key != RecrawlStore.make_key("https://example.com/a", "fields=content,markdown")
+    state = {"etag": ETAG, "last_modified": None, "fingerprint": fingerprint("text"), "response": {"content": "é"}}
+
+    async def run():
+        assert await store.get(key) is None
+        await store.set(key, state)
+        return await store.get(key)
+
+    assert asyncio.run(run()) == state
+    store.record("not_modified")
+    store.record("changed")
+    stats = store.stats()
+    assert (stats["entries"], stats["not_modified"], stats["unchanged"], stats["changed"]) == (1, 1, 0, 1)
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from llm_client import parse_blocks
+from streaming import REPLACEMENT_CHAR, ContentStreamParser, OrderedChunks, sse_event
+
+
+def feed_in_pieces(text: str, size: int) -> str:
+    parser = ContentStreamParser()
+    return "".join(parser.feed(text[i:i + size]) for i in range(0, len(text), size))
+
+
+def blocks_answer(*contents: str) -> str:
+    blocks = [{"content": content, "main_content_image_urls": [], "metadata": {"title": "T"}} for content in contents]
+    return "<blocks>" + json.dumps(blocks) + "</blocks>"
+
+
+def test_sse_event_format():
+    assert sse_event("result", {"a": 1}) == 'event: result\ndata: {"a": 1}\n\n'
+    assert sse_event("result", '{"b":2}') == 'event: result\ndata: {"b":2}\n\n'
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_parser_matches_complete_parse_for_any_split(size):
+    answer = blocks_answer("# Title\n\nFirst \"quoted\" paragraph", "Tab\there, slash \\ and café")
+    expected = "\n\n".join(block["content"] for block in parse_blocks(answer))
+    assert feed_in_pieces(answer, size) == expected
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_parser_decodes_unicode_escapes_and_surrogate_pairs(size):
+    # json.dumps escapes non-ASCII by default: é and the pair 😀
+    answer = blocks_answer("café \U0001F600 end")
+    assert "\\ud83d\\ude00" in answer
+    assert feed_in_pieces(answer, size) == "café \U0001F600 end"
+
+
+def test_parser_replaces_lone_surrogates():
+    answer = '<blocks>[{"content": "a\\ud83d\\ud83db\\ude00c\\ud83d"}]</blocks>'
+    assert feed_in_pieces(answer, 1) == f"a{REPLACEMENT_CHAR}{REPLACEMENT_CHAR}b{REPLACEMENT_CHAR}c{REPLACEMENT_CHAR}"
+
+
+def test_parser_ignores_nested_content_keys_and_other_fields():
+    answer = '<blocks>[{"metadata": {"content": "nested"}, "links": ["content"], "content": "kept"}]</blocks>'
+    assert feed_in_pieces(answer, 3) == "kept"
+
+
+def test_parser_waits_for_the_blocks_tag_and_stops_at_the_end():
+    parser = ContentStreamParser()
+    assert parser.feed("Sure, here is the JSON: <blo") == ""
+    assert parser.feed('cks>[{"content": "x') == "x"
+    assert parser.feed('y"}]</blocks> [{"content": "after"}]') == "y"
+    assert parser.feed('"more"') == ""
+
+
+def test_parser_accepts_bare_json():
+    assert feed_in_pieces('  [{"content": "bare"}]', 2) == "bare"
+
+
+def test_ordered_chunks_hold_back_later_chunks():
+    emitted = []
+
+    async def emit(index, text):
+        emitted.append((index, text))
+
+    async def run():
+        ordered = OrderedChunks(3, emit)
+        await ordered.write(1, "b1")
+        await ordered.write(0, "a1")
+        await ordered.write(2, "c1")
+        await ordered.finish(2)
+        await ordered.write(1, "b2")
+        await ordered.finish(0)
+        await ordered.write(1, "b3")
+        await ordered.finish(1)
+
+    asyncio.run(run())
+    assert emitted == [(0, "a1"), (1, "b1b2"), (1, "b3"), (2, "c1")]